@@ -3,69 +3,82 @@ import os
 import sys
 import threading
 import time
-from pynput import keyboard
 import subprocess
-import pyautogui
-from pynput.keyboard import Key, Controller
 import tkinter as tk
 from tkinter import font
 import logging
 from datetime import datetime
 import difflib
-from PIL import Image, ImageEnhance
-import pytesseract
 import re
-import gc
-from functools import lru_cache
+import tracemalloc
+import hashlib
+import pickle
+from collections import Counter, OrderedDict, deque, namedtuple
+from types import MappingProxyType
+import random
+import statistics
 import io  # 添加io模块导入
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import ctypes
+import ctypes.util
+import importlib
+import queue
+import select
+import shutil
+import struct
+import tempfile
+
+# 启动计时起点：启动耗时报告中的时间都相对于这里
+processStartTime = time.perf_counter()
 
 # 日志记录器相关代码
 
 def setupLogger(name, level=logging.INFO):
     """设置日志记录器，所有模块共享一个日志文件"""
-    # 创建logs目录
-    logsDir = "logs"
-    if not os.path.exists(logsDir):
-        os.makedirs(logsDir)
-
-    # 创建格式化的日志文件名（包含毫秒）
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # 保留毫秒（去掉微秒的后三位）
-    logPath = os.path.join(logsDir, f"HelldiverAutoAssets_{timestamp}.log")
-
     # 创建logger
     logger = logging.getLogger(name)
     logger.setLevel(level)
-
-    # 创建文件处理器 - 只在第一次创建时添加
-    if not hasattr(setupLogger, 'log_file_path'):
-        setupLogger.logFilePath = logPath
-        fileHandler = logging.FileHandler(logPath, encoding='utf-8')
-        fileHandler.setLevel(level)
-
-        # 创建控制台处理器
-        consoleHandler = logging.StreamHandler()
-        consoleHandler.setLevel(level)
-
-        # 创建格式器
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        fileHandler.setFormatter(formatter)
-        consoleHandler.setFormatter(formatter)
-
-        # 添加处理器到logger
-        logger.addHandler(fileHandler)
-        logger.addHandler(consoleHandler)
-    else:
-        # 如果不是第一次创建，使用已存在的日志文件路径
-        fileHandler = logging.FileHandler(setupLogger.logFilePath, encoding='utf-8')
-        fileHandler.setLevel(level)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        fileHandler.setFormatter(formatter)
-        logger.addHandler(fileHandler)
-
+    # 同名记录器已经设置过时直接返回，避免重复添加处理器导致日志重复输出
+    if logger.handlers:
+        return logger
+
+    # 创建格式器
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    # 创建控制台处理器
+    consoleHandler = logging.StreamHandler()
+    consoleHandler.setLevel(level)
+    consoleHandler.setFormatter(formatter)
+    logger.addHandler(consoleHandler)
+
+    # OCR工作进程重新导入本模块时只输出到控制台，不再各自创建一个日志文件
+    if multiprocessing.parent_process() is not None:
+        return logger
+
+    # 第一次调用时确定日志文件路径，之后的记录器都写入同一个文件
+    if not hasattr(setupLogger, 'logFilePath'):
+        # 创建logs目录
+        logsDir = "logs"
+        if not os.path.exists(logsDir):
+            os.makedirs(logsDir)
+        # 创建格式化的日志文件名（包含毫秒）
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # 保留毫秒（去掉微秒的后三位）
+        setupLogger.logFilePath = os.path.join(logsDir, f"HelldiverAutoAssets_{timestamp}.log")
+
+    # 创建文件处理器
+    fileHandler = logging.FileHandler(setupLogger.logFilePath, encoding='utf-8')
+    fileHandler.setLevel(level)
+    fileHandler.setFormatter(formatter)
+    logger.addHandler(fileHandler)
     return logger
 
 # 定义不同模块的日志记录器 - 全部使用同一个日志文件
 mainLogger = setupLogger('main_app')
+screenshotLogger = setupLogger('screenshot')
+ocrLogger = setupLogger('ocr')
+bindingLogger = setupLogger('binding')
+guiLogger = setupLogger('gui')
 
 # 加载配置文件
 configDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Config")
@@ -95,14 +108,11 @@ vanillaConfigPath = os.path.join(configDir, "Vanilla.json")
 
 # 根据OCR语言设置动态确定Assets配置文件路径
 def getAssetsConfigPath():
-    # 首先尝试加载基础配置获取OCR语言设置
-    basicConfig = loadJson(vanillaConfigPath)
+    # 使用已加载的基础配置获取OCR语言设置，不再重复读取Vanilla.json
     ocrLanguage = basicConfig.get("ocr_language", "chi_sim")
     assetsDir = os.path.join(configDir, "Assets")
     return os.path.join(assetsDir, f"{ocrLanguage}.json")
 
-assetsConfigPath = getAssetsConfigPath()
-
 # 如果Vanilla.json不存在，使用默认配置并创建它
 if not os.path.exists(vanillaConfigPath):
     defaultVanilla = {
@@ -118,7 +128,42 @@ if not os.path.exists(vanillaConfigPath):
         "player3": "3",
         "player4": "4",
         "player5": "5",
-        "ocr_language": "chi_sim"
+        "ocr_language": "chi_sim",
+        "ocr_parallel": True,
+        "ocr_workers": 0,
+        "ocr_engine": "auto",
+        "ocr_engine_instances": 1,
+        "tesseract_library": "",
+        "ocr_early_exit_confidence": 80,
+        "ocr_early_exit_similarity": 0.9,
+        "slot_change_detection": True,
+        "slot_change_threshold": 3.0,
+        "preprocess_batch": True,
+        "preprocess_threshold": "fixed",
+        "buffer_pool_mb": 16,
+        "trace_memory": False,
+        "similarity_index": True,
+        "similarity_kernel": "bitparallel",
+        "match_one_to_one": True,
+        "match_cache": True,
+        "match_cache_size": 4096,
+        "fast_start": True,
+        "assets_hot_reload": True,
+        "assets_watch_interval": 1.0,
+        "input_repeat_policy": "drop",
+        "input_queue_size": 4,
+        "input_backend": "pynput",
+        "latency_trace": True,
+        "capture_backend": "auto",
+        "capture_file_dir": "Config/FakeScreen",
+        "menu_watch": False,
+        "menu_watch_interval": 0.25,
+        "layout_auto_calibrate": True,
+        "blank_slot_detection": True,
+        "stream_bindings": True,
+        "key_timing_profile": "conservative",
+        "key_timing_custom": {"ctrl_delay_ms": 30, "press_ms": 30, "gap_ms": 30, "release_delay_ms": 30},
+        "key_timing_overrides": {}
     }
     # 确保Config目录存在
     if not os.path.exists(configDir):
@@ -126,11 +171,10 @@ if not os.path.exists(vanillaConfigPath):
     with open(vanillaConfigPath, 'w', encoding='utf-8') as f:
         json.dump(defaultVanilla, f, ensure_ascii=False, indent=4)
 
-# 加载实际配置文件
+# 加载实际配置文件（整个程序只读取这一次）
 basicConfig = loadJson(vanillaConfigPath)
-# 根据OCR语言设置加载Assets配置文件
+# 根据OCR语言设置确定Assets配置文件，内容由 getAssetCatalog() 通过编译缓存加载
 assetsConfigPath = getAssetsConfigPath()
-assetsData = loadJson(assetsConfigPath)
 
 # TESSERACT结果存储（运行时更新）
 tesseractResults = {}
@@ -141,57 +185,6 @@ guiData = []
 # 标记：指示程序完全在内存中处理数据，不与文件交互
 memoryOnlyMode = True
 
-# 日志记录器相关代码
-def setupLogger(name, level=logging.INFO):
-    """设置日志记录器，所有模块共享一个日志文件"""
-    # 创建logs目录
-    logsDir = "logs"
-    if not os.path.exists(logsDir):
-        os.makedirs(logsDir)
-
-    # 创建格式化的日志文件名（包含毫秒）
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # 保留毫秒（去掉微秒的后三位）
-    logPath = os.path.join(logsDir, f"HelldiverAutoAssets_{timestamp}.log")
-
-    # 创建logger
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
-
-    # 创建文件处理器 - 只在第一次创建时添加
-    if not hasattr(setupLogger, 'log_file_path'):
-        setupLogger.logFilePath = logPath
-        fileHandler = logging.FileHandler(logPath, encoding='utf-8')
-        fileHandler.setLevel(level)
-
-        # 创建控制台处理器
-        consoleHandler = logging.StreamHandler()
-        consoleHandler.setLevel(level)
-
-        # 创建格式器
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        fileHandler.setFormatter(formatter)
-        consoleHandler.setFormatter(formatter)
-
-        # 添加处理器到logger
-        logger.addHandler(fileHandler)
-        logger.addHandler(consoleHandler)
-    else:
-        # 如果不是第一次创建，使用已存在的日志文件路径
-        fileHandler = logging.FileHandler(setupLogger.logFilePath, encoding='utf-8')
-        fileHandler.setLevel(level)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        fileHandler.setFormatter(formatter)
-        logger.addHandler(fileHandler)
-
-    return logger
-
-# 定义不同模块的日志记录器 - 全部使用同一个日志文件
-mainLogger = setupLogger('main_app')
-screenshotLogger = setupLogger('screenshot')
-ocrLogger = setupLogger('ocr')
-bindingLogger = setupLogger('binding')
-guiLogger = setupLogger('gui')
-
 # 安全地设置stdout编码 - 终极版本
 def safe_set_stdout_encoding():
     """安全设置stdout编码，处理各种打包环境下的特殊情况"""
@@ -225,29 +218,145 @@ def safe_set_stdout_encoding():
 # 调用安全设置函数
 safe_set_stdout_encoding()
 
-@lru_cache(maxsize=128)  # 缓存资产文本加载结果
-def loadAssetsText():
-    """加载assetsData中的【左侧中文文本】作为对比库 加载所有分类（Map, Player下的R/G/B）"""
-    global assetsData
-    # 仅在必要时重新加载配置文件
+# ===================== 延迟导入与启动计时 =====================
+# pyautogui / PIL / NumPy / pytesseract 导入很慢，快速启动模式下先显示悬浮窗并注册热键，
+# 再由后台线程导入这些模块，在首次F12之前完成；pynput 在悬浮窗显示之后、注册热键之前导入
+
+keyboard = Key = Controller = None
+pyautogui = pytesseract = np = None
+Image = ImageEnhance = ImageChops = ImageStat = ImageFilter = ImageDraw = None
+
+heavyModuleNames = ("numpy", "PIL.Image", "PIL.ImageEnhance", "PIL.ImageChops", "PIL.ImageStat",
+                    "PIL.ImageFilter", "PIL.ImageDraw", "pytesseract")
+heavyModulesLock = threading.Lock()
+heavyModulesLoaded = False
+ocrModulesLoaded = False
+moduleImportTimes = []                                        # [(模块名, 导入耗时秒数)]
+startupMarks = [("加载配置和日志", time.perf_counter())]      # [(启动阶段, 完成时刻)]
+startupReportRequested = "--startup-report" in sys.argv
+
+
+def timedImport(moduleName):
+    """导入模块并记录耗时（包含其依赖模块，相当于 -X importtime 的累计耗时）"""
+    startTime = time.perf_counter()
+    module = importlib.import_module(moduleName)
+    moduleImportTimes.append((moduleName, time.perf_counter() - startTime))
+    return module
+
+
+def importInputModules():
+    """导入pynput（全局热键、小键盘监听和模拟按键需要），重复调用时直接返回"""
+    global keyboard, Key, Controller
+    if keyboard is not None:
+        return
+    pynputKeyboard = timedImport("pynput.keyboard")
+    Key, Controller = pynputKeyboard.Key, pynputKeyboard.Controller
+    keyboard = pynputKeyboard
+
+
+def importOcrModules():
+    """只导入图像处理和OCR相关模块（NumPy、PIL、pytesseract），OCR子进程只需要这些，不导入pyautogui"""
+    global ocrModulesLoaded, np, pytesseract
+    global Image, ImageEnhance, ImageChops, ImageStat, ImageFilter, ImageDraw
+    with heavyModulesLock:
+        if ocrModulesLoaded:
+            return
+        modules = {moduleName: timedImport(moduleName) for moduleName in heavyModuleNames}
+        np = modules["numpy"]
+        Image, ImageEnhance, ImageChops = modules["PIL.Image"], modules["PIL.ImageEnhance"], modules["PIL.ImageChops"]
+        ImageStat, ImageFilter, ImageDraw = modules["PIL.ImageStat"], modules["PIL.ImageFilter"], modules["PIL.ImageDraw"]
+        pytesseract = modules["pytesseract"]
+        ocrModulesLoaded = True
+
+
+def importHeavyModules():
+    """导入图像处理、OCR相关模块和pyautogui，重复调用时直接返回；后台线程正在导入时等待其完成"""
+    global heavyModulesLoaded, pyautogui
+    importOcrModules()
+    with heavyModulesLock:
+        if heavyModulesLoaded:
+            return
+        try:
+            pyautogui = timedImport("pyautogui")
+        except Exception as e:
+            # 没有桌面时pyautogui无法导入；只在真正需要它的截图/模拟按键/鼠标操作时报错
+            mainLogger.warning(f"pyautogui 导入失败，截图和鼠标键盘操作将不可用: {e}")
+        heavyModulesLoaded = True
+
+
+def requirePyautogui(purpose):
+    """确保pyautogui可用，否则抛出说明用途的异常"""
+    importHeavyModules()
+    if pyautogui is None:
+        raise RuntimeError(f"pyautogui 不可用，无法{purpose}")
+
+
+def enableDpiAwareness():
+    """与pyautogui导入时相同，让进程感知DPI缩放；延迟导入pyautogui时需要在创建窗口前自行设置"""
+    if sys.platform == 'win32':
+        try:
+            ctypes.windll.user32.SetProcessDPIAware()
+        except AttributeError:
+            pass
+
+
+def getScreenSize():
+    """获取屏幕分辨率；pyautogui尚未导入时直接向系统或悬浮窗查询，不为此导入pyautogui"""
+    if pyautogui is not None:
+        return tuple(pyautogui.size())
+    if sys.platform == 'win32':
+        user32 = ctypes.windll.user32
+        return user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)
+    root = globalState["initialWindow"]
+    if root is not None:
+        return root.winfo_screenwidth(), root.winfo_screenheight()
+    requirePyautogui("获取屏幕分辨率")
+    return tuple(pyautogui.size())
+
+
+def markStartup(phase):
+    """记录一个启动阶段的完成时刻"""
+    startupMarks.append((phase, time.perf_counter()))
+
+
+def printStartupReport():
+    """输出启动耗时报告：各启动阶段的完成时刻，以及慢速模块各自的导入耗时"""
+    lines = ["启动耗时报告（从加载主程序开始计时）", f"  {'完成时刻(ms)':>10}  {'阶段耗时(ms)':>10}  阶段"]
+    previousMoment = processStartTime
+    for phase, moment in sorted(startupMarks, key=lambda mark: mark[1]):
+        lines.append(f"  {(moment - processStartTime) * 1000:>14.1f}  {(moment - previousMoment) * 1000:>14.1f}  {phase}")
+        previousMoment = moment
+    lines.append(f"  {'导入耗时(ms)':>10}  模块")
+    for moduleName, seconds in moduleImportTimes:
+        lines.append(f"  {seconds * 1000:>14.1f}  {moduleName}")
+    report = "\n".join(lines)
+    print(report)
+    mainLogger.info(report)
+
+
+def loadHeavyModulesInBackground():
+    """后台导入图像/OCR模块，然后预先启动OCR进程池（子进程内各自预热引擎）或在本进程预热OCR引擎"""
     try:
-        if not isinstance(assetsData, dict):
-            raise ValueError("assetsData 格式不正确，必须是字典类型")
-        # 加载所有分类：Map, Player下的R/G/B
-        combinedAssets = {}
-        # 处理Map顶层分类
-        if "Map" in assetsData and isinstance(assetsData["Map"], dict):
-            combinedAssets.update(assetsData["Map"])
-        # 处理Player下的R/G/B分类
-        if "Player" in assetsData and isinstance(assetsData["Player"], dict):
-            for subCat in ["R", "G", "B"]:
-                if subCat in assetsData["Player"] and isinstance(assetsData["Player"][subCat], dict):
-                    combinedAssets.update(assetsData["Player"][subCat])
-        ocrLogger.info(f"成功加载对比文本数量：{len(combinedAssets)} 条")
-        return combinedAssets
+        importHeavyModules()
+        markStartup("导入图像/OCR模块")
+        getAssetCatalog()
+        markStartup("加载战备目录")
+        # 批量引擎在本进程中启动tesseract，不会用到进程池
+        usePool = basicConfig.get("ocr_parallel", True) and not isBatchOcrEngine()
+        if usePool:
+            startOcrProcessPool()
+        else:
+            warmUpOcrEngine()
+        markStartup("启动OCR进程池" if usePool else "预热OCR引擎")
     except Exception as e:
-        ocrLogger.error(f"加载配置数据失败：{str(e)}")
-        return {}
+        mainLogger.error(f"后台加载图像/OCR模块失败: {e}")
+    if startupReportRequested:
+        printStartupReport()
+
+
+def loadAssetsText():
+    """加载assetsData中的【左侧中文文本】作为对比库 加载所有分类（Map, Player下的R/G/B）"""
+    return getAssetCatalog().commands
 
 def get_similarity(text1, text2):
     """计算两个中文文本的相似度（0-1，1=完全相同），优化中文匹配精度"""
@@ -265,11 +374,17 @@ def get_similarity(text1, text2):
     else:
         return difflib.SequenceMatcher(None, clean_text1, clean_text2).ratio()
 
-def find_most_similar(target_text, text_list, threshold=0.3):  # 降低阈值，让更多的匹配能够通过
+def find_most_similar(target_text, text_list, threshold=0.3, useIndex=None):  # 降低阈值，让更多的匹配能够通过
     """从中文对比库中找出相似度最高的文本，增加阈值控制"""
     if not target_text or not text_list:
         return None, 0.0
 
+    # 默认使用n-gram索引缩小候选范围（结果与逐条比较相同）
+    if useIndex is None:
+        useIndex = basicConfig.get("similarity_index", True)
+    if useIndex:
+        return getAssetNgramIndex(text_list).find(target_text)
+
     # 使用内置max函数和生成器表达式优化性能
     similarities = ((text, get_similarity(target_text, text)) for text in text_list)
     try:
@@ -278,6 +393,830 @@ def find_most_similar(target_text, text_list, threshold=0.3):  # 降低阈值，
     except ValueError:  # 空序列
         return None, 0.0
 
+# ===================== 字符n-gram倒排索引 =====================
+# 战备库很大时（社区整合包可能有成百上千条），逐条计算SequenceMatcher代价很高。
+# 索引按二元/三元字符组找出最可能的少量候选先精确计算，再用字符重叠数给其余条目算相似度上界，
+# 只有上界可能超过当前最优值的条目才需要精确计算，因此结果与逐条比较完全一致。
+chineseCharPattern = re.compile(r'[^\u4e00-\u9fff]')
+
+
+def charNgrams(text):
+    """返回文本的二元组和三元组集合；不足两个字符时返回单字"""
+    if len(text) < 2:
+        return {text} if text else set()
+    grams = {text[i:i + 2] for i in range(len(text) - 1)}
+    grams.update(text[i:i + 3] for i in range(len(text) - 2))
+    return grams
+
+
+class AssetNgramIndex:
+    """战备名称的n-gram倒排索引，find() 的返回值与 find_most_similar 逐条比较的结果相同"""
+
+    def __init__(self, names, topK=16):
+        self.names = list(names)
+        self.topK = topK
+        self.cleanNames = [chineseCharPattern.sub('', name) for name in self.names]
+        self.gramPostings = {}       # n-gram -> [条目编号]
+        self.cleanCharPostings = {}  # 字 -> [(条目编号, 出现次数)]，只比较中文字符时使用
+        self.rawCharPostings = {}    # 字 -> [(条目编号, 出现次数)]，比较原始文本时使用
+        for i, (name, cleanName) in enumerate(zip(self.names, self.cleanNames)):
+            for gram in charNgrams(cleanName or name):
+                self.gramPostings.setdefault(gram, []).append(i)
+            for char, count in Counter(cleanName).items():
+                self.cleanCharPostings.setdefault(char, []).append((i, count))
+            for char, count in Counter(name).items():
+                self.rawCharPostings.setdefault(char, []).append((i, count))
+
+    def _similarity(self, i, targetText, cleanTarget):
+        """与 get_similarity(targetText, names[i]) 相同，但使用预先清洗好的名称"""
+        name = self.names[i]
+        if targetText == name:
+            return 1.0
+        cleanName = self.cleanNames[i]
+        if not cleanTarget or not cleanName:
+            return difflib.SequenceMatcher(None, targetText, name).ratio()
+        return difflib.SequenceMatcher(None, cleanTarget, cleanName).ratio()
+
+    def _upperBounds(self, targetText, cleanTarget):
+        """按字符重叠数计算每个条目相似度的上界：ratio = 2M/(la+lb)，匹配字符数M不超过重叠字符数"""
+        overlaps = {}
+        if cleanTarget:
+            for char, targetCount in Counter(cleanTarget).items():
+                for i, count in self.cleanCharPostings.get(char, ()):
+                    overlaps[i] = overlaps.get(i, 0) + min(targetCount, count)
+        for char, targetCount in Counter(targetText).items():
+            for i, count in self.rawCharPostings.get(char, ()):
+                # 两边都有中文字符的条目只比较中文部分，不能使用原始文本的重叠数
+                if cleanTarget and self.cleanNames[i]:
+                    continue
+                overlaps[i] = overlaps.get(i, 0) + min(targetCount, count)
+        bounds = {}
+        for i, overlap in overlaps.items():
+            if cleanTarget and self.cleanNames[i]:
+                totalLength = len(cleanTarget) + len(self.cleanNames[i])
+            else:
+                totalLength = len(targetText) + len(self.names[i])
+            bounds[i] = 2.0 * overlap / totalLength if totalLength else 1.0
+        return bounds
+
+    def find(self, targetText):
+        """返回 (最相似的名称, 相似度)；相似度相同时与 max() 一样取靠前的条目"""
+        if not targetText or not self.names:
+            return None, 0.0
+        cleanTarget = chineseCharPattern.sub('', targetText)
+
+        # 第一步：按共享n-gram数量选出前topK个候选，精确计算
+        gramHits = Counter()
+        for gram in charNgrams(cleanTarget or targetText):
+            gramHits.update(self.gramPostings.get(gram, ()))
+        bestIndex, bestScore = 0, -1.0
+        evaluated = set()
+        for i, _ in gramHits.most_common(self.topK):
+            score = self._similarity(i, targetText, cleanTarget)
+            evaluated.add(i)
+            if score > bestScore or (score == bestScore and i < bestIndex):
+                bestIndex, bestScore = i, score
+
+        # 第二步：其余条目只有相似度上界可能超过当前最优值时才精确计算
+        bounds = self._upperBounds(targetText, cleanTarget)
+        for i, bound in sorted(bounds.items(), key=lambda item: -item[1]):
+            if bound < bestScore:
+                break
+            if i in evaluated or (bound == bestScore and i > bestIndex):
+                continue
+            score = self._similarity(i, targetText, cleanTarget)
+            if score > bestScore or (score == bestScore and i < bestIndex):
+                bestIndex, bestScore = i, score
+
+        # 没有任何字符重叠的条目相似度为0，全部为0时与max()一样返回第一个条目
+        if bestScore <= 0.0:
+            return self.names[0], 0.0
+        return self.names[bestIndex], bestScore
+
+    def similarityMatrix(self, texts):
+        """返回 len(texts) × len(names) 的相似度矩阵"""
+        matrix = np.zeros((len(texts), len(self.names)), dtype=np.float64)
+        for row, text in enumerate(texts):
+            cleanTarget = chineseCharPattern.sub('', text)
+            for i in range(len(self.names)):
+                matrix[row, i] = self._similarity(i, text, cleanTarget)
+        return matrix
+
+
+def buildPatternMasks(text):
+    """为位并行LCS构造字符位掩码：第i位为1表示 text[i] 是该字符"""
+    masks = {}
+    for i, char in enumerate(text):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def bitParallelLcsLength(patternMasks, patternLength, text):
+    """Hyyrö/Allison-Dix 位并行LCS：每个字符只需几次整数运算，Python大整数不受64位长度限制"""
+    fullMask = (1 << patternLength) - 1
+    vector = fullMask
+    for char in text:
+        matches = vector & patternMasks.get(char, 0)
+        vector = ((vector + matches) | (vector - matches)) & fullMask
+    return patternLength - bin(vector).count("1")
+
+
+bitCountTable = None       # 每个字节值中1的位数，首次使用时创建（NumPy为延迟导入）
+maxVectorNameLength = 64  # 超过64个字符的名称放不进uint64位向量，矩阵计算时逐条计算
+
+
+def popcount64(values):
+    """逐元素统计uint64数组中为1的位数"""
+    global bitCountTable
+    if bitCountTable is None:
+        bitCountTable = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return bitCountTable[np.ascontiguousarray(values).view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64)
+
+
+def buildMaskTable(texts, skipIndices):
+    """把一组名称的位掩码按字符转置：字符 -> (条目编号数组, uint64掩码数组)，供整列同时计算LCS"""
+    lengths = np.array([len(text) for text in texts], dtype=np.int64)
+    fullMasks = np.array([(1 << min(len(text), maxVectorNameLength)) - 1 for text in texts], dtype=np.uint64)
+    postings = {}
+    for i, text in enumerate(texts):
+        if i in skipIndices:
+            continue
+        for char, mask in buildPatternMasks(text).items():
+            postings.setdefault(char, ([], []))
+            postings[char][0].append(i)
+            postings[char][1].append(mask)
+    postings = {char: (np.array(indices, dtype=np.int64), np.array(masks, dtype=np.uint64))
+                for char, (indices, masks) in postings.items()}
+    return lengths, fullMasks, postings
+
+
+class AssetMatcher(AssetNgramIndex):
+    """预先清洗并缓存所有战备名称的匹配器，使用位并行编辑距离（插入/删除距离）计算相似度
+
+    相似度 = 1 - 插入删除距离 / 两串总长 = 2*LCS / 两串总长，与 SequenceMatcher.ratio() 的定义
+    2*匹配字符数 / 两串总长 同一量纲（LCS不小于ratio的匹配字符数，通常两者相等），
+    因此 find_most_similar 的0.3阈值依然适用；n-gram索引的上界剪枝同样成立。
+    """
+
+    def __init__(self, names, topK=16):
+        super().__init__(names, topK)
+        self.cleanMasks = [buildPatternMasks(cleanName) for cleanName in self.cleanNames]
+        self.rawMasks = [buildPatternMasks(name) for name in self.names]
+        # 相似度矩阵使用的转置掩码表：同一个字符对应所有条目的掩码，一次更新整列位向量
+        self.longNameIndices = [i for i, name in enumerate(self.names) if len(name) > maxVectorNameLength]
+        skipIndices = set(self.longNameIndices)
+        self.cleanTable = buildMaskTable(self.cleanNames, skipIndices)
+        self.rawTable = buildMaskTable(self.names, skipIndices)
+        self.hasCleanName = np.array([bool(cleanName) for cleanName in self.cleanNames])
+
+    def _similarity(self, i, targetText, cleanTarget):
+        name = self.names[i]
+        if targetText == name:
+            return 1.0
+        cleanName = self.cleanNames[i]
+        if cleanTarget and cleanName:
+            patternMasks, patternLength, text = self.cleanMasks[i], len(cleanName), cleanTarget
+        else:
+            patternMasks, patternLength, text = self.rawMasks[i], len(name), targetText
+        totalLength = patternLength + len(text)
+        if not totalLength:
+            return 1.0
+        return 2.0 * bitParallelLcsLength(patternMasks, patternLength, text) / totalLength
+
+    def match(self, text):
+        """返回 (最相似的名称, 相似度)"""
+        return self.find(text)
+
+    def match_many(self, texts):
+        """批量匹配，按输入顺序返回 [(最相似的名称, 相似度), ...]"""
+        return [self.find(text) for text in texts]
+
+    def _similarityRow(self, table, text):
+        """一个文本与所有条目的相似度：位向量按条目排成uint64数组，每个字符只更新含有该字符的条目"""
+        lengths, fullMasks, postings = table
+        vector = fullMasks.copy()
+        for char in text:
+            posting = postings.get(char)
+            if posting is None:
+                continue  # 没有条目含有该字符，位向量不变
+            indices, masks = posting
+            current = vector[indices]
+            matches = current & masks
+            vector[indices] = ((current + matches) | (current - matches)) & fullMasks[indices]
+        lcsLengths = lengths - popcount64(vector)
+        totalLengths = lengths + len(text)
+        return np.where(totalLengths > 0, 2.0 * lcsLengths / np.maximum(totalLengths, 1), 1.0)
+
+    def similarityMatrix(self, texts):
+        """返回 len(texts) × len(names) 的相似度矩阵，与逐条调用 _similarity 的结果相同"""
+        matrix = np.zeros((len(texts), len(self.names)), dtype=np.float64)
+        for row, text in enumerate(texts):
+            cleanTarget = chineseCharPattern.sub('', text)
+            if cleanTarget:
+                matrix[row] = self._similarityRow(self.cleanTable, cleanTarget)
+                if not self.hasCleanName.all():
+                    rawRow = self._similarityRow(self.rawTable, text)
+                    matrix[row] = np.where(self.hasCleanName, matrix[row], rawRow)
+            else:
+                matrix[row] = self._similarityRow(self.rawTable, text)
+            for i in self.longNameIndices:
+                matrix[row, i] = self._similarity(i, text, cleanTarget)
+        return matrix
+
+
+def assignOneToOne(scores):
+    """在 栏位 × 战备 相似度矩阵上求一对一的最大总相似度匹配（匈牙利算法）
+
+    返回每一行分配到的列号，行数多于列数时未分配的行为-1。值为 -inf 的格子禁止分配，只能分配到这种格子的行同样为-1。
+    各行的最高分列互不相同时直接采用（与逐个栏位匹配的结果相同），只有发生冲突时才求解分配问题。
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    rowCount, columnCount = scores.shape
+    if rowCount == 0 or columnCount == 0:
+        return [-1] * rowCount
+    forbidden = np.isneginf(scores)
+    if forbidden.any():
+        # 匈牙利算法中用一个远低于任何相似度的有限值代替 -inf，避免出现 inf - inf
+        scores = np.where(forbidden, -1e6, scores)
+    bestColumns = scores.argmax(axis=1)
+    if len(set(bestColumns.tolist())) == rowCount:
+        return [-1 if forbidden[row, column] else int(column) for row, column in enumerate(bestColumns)]
+
+    # 匈牙利算法要求行数不超过列数，否则转置后求解
+    transposed = rowCount > columnCount
+    cost = -(scores.T if transposed else scores)
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)  # owner[j]：第j列分配给的行（从1开始，0表示未分配）
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minValues = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            free = ~used[1:]
+            reduced = cost[owner[j0] - 1] - u[owner[j0]] - v[1:]
+            improved = free & (reduced < minValues[1:])
+            minValues[1:][improved] = reduced[improved]
+            way[1:][improved] = j0
+            candidates = np.where(free, minValues[1:], np.inf)
+            j1 = int(candidates.argmin()) + 1
+            delta = candidates[j1 - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minValues[1:][free] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    assignment = [-1] * rowCount
+    for j in range(1, m + 1):
+        if owner[j]:
+            if transposed:
+                assignment[j - 1] = int(owner[j]) - 1
+            else:
+                assignment[int(owner[j]) - 1] = j - 1
+    return [-1 if column >= 0 and forbidden[row, column] else column for row, column in enumerate(assignment)]
+
+
+assetIndexCache = {"key": None, "index": None}
+assetIndexLock = threading.Lock()
+
+
+def getAssetNgramIndex(names, kernel=None):
+    """返回名称列表对应的匹配索引，名称列表和相似度算法不变时复用已建好的索引
+
+    kernel 为 "bitparallel"（默认，AssetMatcher）或 "difflib"（AssetNgramIndex，与 get_similarity 完全一致）。
+    """
+    if kernel is None:
+        kernel = basicConfig.get("similarity_kernel", "bitparallel")
+    key = (kernel, tuple(names))
+    # 完整的战备名称列表直接使用战备目录中预先编译好的索引
+    catalog = assetCatalog
+    if catalog is not None and catalog.matcher is not None and key == (catalog.kernel, catalog.names):
+        return catalog.matcher
+    with assetIndexLock:
+        if assetIndexCache["key"] != key:
+            indexClass = AssetMatcher if kernel == "bitparallel" else AssetNgramIndex
+            assetIndexCache["index"] = indexClass(key[1])
+            assetIndexCache["key"] = key
+        return assetIndexCache["index"]
+
+
+# ===================== 编译后的战备目录 =====================
+# 战备库JSON只遍历一次，扁平化的 名称→指令 / 名称→分类 映射、Map/Player分类集合和匹配索引
+# 一起序列化到 Config/Assets/<语言>.catalog，源文件未变化时启动只需读取这一个文件
+
+catalogFormatVersion = 1
+playerSubCategories = ("R", "G", "B")
+
+
+def iterCategoryGroups(tree):
+    """按 Map、R、G、B 的顺序遍历战备库JSON，返回 (分类, {战备名称: 指令}) 列表"""
+    groups = []
+    if isinstance(tree.get("Map"), dict):
+        groups.append(("Map", tree["Map"]))
+    player = tree.get("Player")
+    if isinstance(player, dict):
+        groups.extend((subCategory, player[subCategory]) for subCategory in playerSubCategories
+                      if isinstance(player.get(subCategory), dict))
+    return groups
+
+
+class AssetCatalog:
+    """战备库的扁平视图，所有字段在编译时一次算好"""
+
+    def __init__(self, tree, sourceHash, kernel):
+        self.tree = tree if isinstance(tree, dict) else {}
+        self.sourceHash = sourceHash
+        self.kernel = kernel
+        self.commands = {}        # {战备名称: 指令}，Map和R/G/B中的同名条目以后者为准
+        self.categories = {}      # {战备名称: 分类(Map/R/G/B)}
+        mapCategory = set()
+        playerCategory = set()
+        for category, entries in iterCategoryGroups(self.tree):
+            self.commands.update(entries)
+            for name in entries:
+                self.categories[name] = category
+            (mapCategory if category == "Map" else playerCategory).update(entries)
+        self.mapCategory = frozenset(mapCategory)
+        self.playerCategory = frozenset(playerCategory)
+        self.names = tuple(self.commands)
+        indexClass = AssetMatcher if kernel == "bitparallel" else AssetNgramIndex
+        self.matcher = indexClass(self.names) if self.names else None
+
+
+def getCatalogPath(sourcePath):
+    """编译结果与战备库JSON放在同一目录：Config/Assets/<语言>.catalog"""
+    return os.path.splitext(sourcePath)[0] + ".catalog"
+
+
+def loadAssetCatalog(sourcePath):
+    """读取编译好的战备目录；源文件的修改时间和大小变化且内容哈希也不同时，从JSON重新编译"""
+    catalogPath = getCatalogPath(sourcePath)
+    kernel = basicConfig.get("similarity_kernel", "bitparallel")
+    try:
+        sourceStat = os.stat(sourcePath)
+        sourceStamp = (sourceStat.st_mtime_ns, sourceStat.st_size)
+    except OSError:
+        sourceStamp = None
+
+    stored = None
+    try:
+        with open(catalogPath, 'rb') as f:
+            stored = pickle.load(f)
+        if stored.get("version") != catalogFormatVersion or stored.get("kernel") != kernel:
+            stored = None
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        mainLogger.warning(f"读取编译后的战备目录失败，重新编译: {e}")
+        stored = None
+
+    if stored is not None and sourceStamp is not None and stored["sourceStamp"] == tuple(sourceStamp):
+        catalog = stored["catalog"]
+        mainLogger.info(f"已加载编译后的战备目录 {catalogPath}（{len(catalog.names)} 条）")
+        return catalog
+
+    # 修改时间或大小变化（或缓存不可用）时比较内容哈希，内容未变只需更新时间戳
+    sourceHash = hashFile(sourcePath)
+    if stored is not None and stored["catalog"].sourceHash == sourceHash:
+        catalog = stored["catalog"]
+        mainLogger.info(f"战备库内容未变化，沿用编译后的战备目录（{len(catalog.names)} 条）")
+    else:
+        compileStart = time.perf_counter()
+        catalog = AssetCatalog(loadJson(sourcePath), sourceHash, kernel)
+        mainLogger.info(f"已编译战备目录：{len(catalog.names)} 条（Map {len(catalog.mapCategory)} 个，"
+                        f"Player {len(catalog.playerCategory)} 个），耗时 {(time.perf_counter() - compileStart) * 1000:.1f} ms")
+    if sourceStamp is not None and catalog.names:
+        try:
+            tempPath = catalogPath + ".tmp"
+            with open(tempPath, 'wb') as f:
+                pickle.dump({"version": catalogFormatVersion, "kernel": kernel, "sourceStamp": sourceStamp,
+                             "catalog": catalog}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tempPath, catalogPath)
+        except Exception as e:
+            mainLogger.warning(f"保存编译后的战备目录失败: {e}")
+    return catalog
+
+
+assetCatalog = None
+assetCatalogLock = threading.Lock()
+
+
+def getAssetCatalog():
+    """返回当前的战备目录，第一次调用时加载"""
+    global assetCatalog
+    if assetCatalog is None:
+        importOcrModules()  # 匹配索引使用NumPy
+        with assetCatalogLock:
+            if assetCatalog is None:
+                assetCatalog = loadAssetCatalog(assetsConfigPath)
+                ocrLogger.info(f"成功加载对比文本数量：{len(assetCatalog.commands)} 条")
+    return assetCatalog
+
+
+# ===================== 战备库热重载 =====================
+# 用 AssetsEditor.py 修改当前语言的战备库后，无需重启：后台线程重新编译战备目录并整体替换，
+# 识别流程和小键盘监听只读取 assetCatalog 引用，替换过程中不会丢失按键
+
+inotifyCloseWrite = 0x00000008  # IN_CLOSE_WRITE：文件写入完成并关闭
+inotifyMovedTo = 0x00000080     # IN_MOVED_TO：其他文件被重命名为该文件（先写临时文件再替换）
+inotifyNonBlock = 0o4000        # IN_NONBLOCK
+inotifyCloseOnExec = 0o2000000  # IN_CLOEXEC
+inotifyEventHeader = struct.Struct("iIII")  # struct inotify_event: wd, mask, cookie, len
+
+
+class AssetFileWatcher:
+    """监视战备库JSON的变化：Linux上使用inotify，其他平台或inotify不可用时按间隔比较修改时间和大小
+
+    连续的多次写入在 settleSeconds 内合并为一次回调，回调在监视线程中执行。
+    """
+
+    settleSeconds = 0.3
+
+    def __init__(self, path, onChange, interval=1.0):
+        self.path = os.path.abspath(path)
+        self.onChange = onChange
+        self.interval = max(0.1, float(interval))
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.mode = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopEvent.set()
+
+    def _openInotify(self):
+        """创建inotify实例并监视所在目录（编辑器可能先删除或重命名再写入），失败时返回None"""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(inotifyNonBlock | inotifyCloseOnExec)
+            if fd < 0:
+                return None
+            watchDir = os.path.dirname(self.path).encode(sys.getfilesystemencoding())
+            if libc.inotify_add_watch(fd, watchDir, inotifyCloseWrite | inotifyMovedTo) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except Exception as e:
+            mainLogger.warning(f"inotify不可用，改为定时检查战备库: {e}")
+            return None
+
+    def _fileStamp(self):
+        try:
+            fileStat = os.stat(self.path)
+            return fileStat.st_mtime_ns, fileStat.st_size
+        except OSError:
+            return None
+
+    def _readInotifyEvents(self, fd):
+        """读取所有待处理事件，返回其中是否有针对战备库文件的事件"""
+        fileName = os.path.basename(self.path).encode(sys.getfilesystemencoding())
+        matched = False
+        while True:
+            try:
+                buffer = os.read(fd, 4096)
+            except BlockingIOError:
+                return matched
+            offset = 0
+            while offset + inotifyEventHeader.size <= len(buffer):
+                _, _, _, nameLength = inotifyEventHeader.unpack_from(buffer, offset)
+                offset += inotifyEventHeader.size
+                name = buffer[offset:offset + nameLength].rstrip(b"\0")
+                offset += nameLength
+                matched = matched or name == fileName
+
+    def _run(self):
+        fd = self._openInotify()
+        self.mode = "inotify" if fd is not None else "polling"
+        mainLogger.info(f"开始监视战备库 {self.path}（{self.mode}）")
+        lastStamp = self._fileStamp()
+        try:
+            while not self.stopEvent.is_set():
+                if fd is not None:
+                    readable, _, _ = select.select([fd], [], [], self.interval)
+                    if not readable or not self._readInotifyEvents(fd):
+                        continue
+                    # 等待写入完全结束，期间的后续事件一并读掉
+                    while select.select([fd], [], [], self.settleSeconds)[0]:
+                        self._readInotifyEvents(fd)
+                else:
+                    if self.stopEvent.wait(self.interval):
+                        break
+                    stamp = self._fileStamp()
+                    if stamp == lastStamp:
+                        continue
+                    # 修改时间或大小在一段时间内不再变化，才认为写入已完成
+                    while not self.stopEvent.wait(self.settleSeconds):
+                        settledStamp = self._fileStamp()
+                        if settledStamp == stamp:
+                            break
+                        stamp = settledStamp
+                lastStamp = self._fileStamp()
+                try:
+                    self.onChange()
+                except Exception as e:
+                    mainLogger.error(f"战备库热重载失败: {e}")
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+
+assetFileWatcher = None
+
+
+def reloadAssetCatalog():
+    """重新编译当前的战备库并整体替换战备目录；正在进行的识别继续使用旧目录的引用"""
+    global assetCatalog, matchMemoCache
+    importOcrModules()
+    reloadStart = time.perf_counter()
+    newCatalog = loadAssetCatalog(assetsConfigPath)
+    oldCatalog = assetCatalog
+    if oldCatalog is not None and newCatalog.sourceHash == oldCatalog.sourceHash:
+        return False
+    if not newCatalog.names:
+        mainLogger.warning("重新加载的战备库为空或格式错误，继续使用当前的战备目录")
+        return False
+    with assetCatalogLock:
+        assetCatalog = newCatalog
+    # 旧目录下的栏位复用结果和匹配缓存不再有效
+    slotChangeDetector.reset()
+    with matchMemoCacheLock:
+        oldMemo, matchMemoCache = matchMemoCache, None
+    if oldMemo is not None:
+        oldMemo.save()
+    oldCount = len(oldCatalog.names) if oldCatalog is not None else 0
+    mainLogger.info(f"战备库已热重载：{oldCount} → {len(newCatalog.names)} 条，"
+                    f"耗时 {(time.perf_counter() - reloadStart) * 1000:.1f} ms；按F12使用新的战备库重新识别")
+    return True
+
+
+def startAssetFileWatcher():
+    """按配置启动战备库监视线程"""
+    global assetFileWatcher
+    if not basicConfig.get("assets_hot_reload", True) or assetFileWatcher is not None:
+        return assetFileWatcher
+    assetFileWatcher = AssetFileWatcher(assetsConfigPath, reloadAssetCatalog,
+                                        basicConfig.get("assets_watch_interval", 1.0)).start()
+    return assetFileWatcher
+
+
+def makeBenchmarkCatalog(size, seed=2024):
+    """用现有战备名称中的汉字随机组合出指定规模的战备库和带噪声的查询文本"""
+    rng = random.Random(seed)
+    charPool = sorted({char for name in loadAssetsText() for char in chineseCharPattern.sub('', name)}) or list("轨道飞鹰")
+    names = []
+    seen = set()
+    while len(names) < size:
+        name = ''.join(rng.choice(charPool) for _ in range(rng.randint(3, 10)))
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    queries = []
+    for _ in range(200):
+        chars = list(rng.choice(names))
+        # 模拟OCR误差：随机删除、替换一个字
+        if len(chars) > 3 and rng.random() < 0.5:
+            del chars[rng.randrange(len(chars))]
+        if rng.random() < 0.5:
+            chars[rng.randrange(len(chars))] = rng.choice(charPool)
+        queries.append(''.join(chars))
+    return names, queries
+
+
+def runSimilarityBenchmark(sizes=(100, 1000, 10000)):
+    """相似度匹配基准：逐条比较 vs n-gram索引 vs 位并行匹配器，并校验匹配结果"""
+    print("相似度匹配基准（每种规模200条带噪声的查询）")
+    for size in sizes:
+        names, queries = makeBenchmarkCatalog(size)
+        buildStart = time.perf_counter()
+        index = AssetNgramIndex(names)
+        buildTime = time.perf_counter() - buildStart
+        buildStart = time.perf_counter()
+        matcher = AssetMatcher(names)
+        matcherBuildTime = time.perf_counter() - buildStart
+
+        startTime = time.perf_counter()
+        bruteResults = [find_most_similar(query, names, useIndex=False) for query in queries]
+        bruteTime = (time.perf_counter() - startTime) / len(queries)
+
+        startTime = time.perf_counter()
+        indexResults = [index.find(query) for query in queries]
+        indexTime = (time.perf_counter() - startTime) / len(queries)
+
+        startTime = time.perf_counter()
+        matcherResults = matcher.match_many(queries)
+        matcherTime = (time.perf_counter() - startTime) / len(queries)
+
+        sameCount = sum(1 for a, b in zip(bruteResults, indexResults) if a == b)
+        sameNameCount = sum(1 for a, b in zip(bruteResults, matcherResults) if a[0] == b[0])
+        print(f"  {size:>6} 条：逐条 {bruteTime * 1000:.3f} ms/次，索引 {indexTime * 1000:.3f} ms/次"
+              f"（{bruteTime / indexTime:.1f}x，建索引 {buildTime * 1000:.1f} ms），结果一致 {sameCount}/{len(queries)}")
+        print(f"  {'':>6}     位并行匹配器 {matcherTime * 1000:.3f} ms/次（{bruteTime / matcherTime:.1f}x，"
+              f"建索引 {matcherBuildTime * 1000:.1f} ms），与逐条比较选出相同战备 {sameNameCount}/{len(queries)}")
+
+# ===================== 匹配结果持久化缓存 =====================
+# 同一个战备被识别错的方式很有限，同样的错误文本会在不同的对局中反复出现，
+# 缓存 识别文本 → (战备名称, 相似度)，再次出现时跳过相似度计算
+
+matchCachePath = os.path.join(configDir, "match_cache.json")
+
+
+def hashFile(filePath):
+    """计算文件内容的SHA-256，文件不存在时返回空字符串"""
+    try:
+        with open(filePath, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return ""
+
+
+class MatchMemoCache:
+    """识别文本 → (战备名称, 相似度) 的LRU缓存，保存在磁盘上，跨会话复用
+
+    缓存与战备文件的内容哈希和相似度算法绑定，任何一个变化时整个缓存失效。
+    """
+
+    def __init__(self, path, capacity, cacheKey):
+        self.path = path
+        self.capacity = max(1, int(capacity))
+        self.cacheKey = cacheKey
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.missSeconds = 0.0  # 写入条目前相似度计算的总耗时，用来估算命中节省的时间
+        self.timedEntries = 0
+        self.load()
+
+    def load(self):
+        """从磁盘读取缓存，文件损坏或缓存键不一致时从空缓存开始"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            ocrLogger.warning(f"读取匹配缓存失败，重新建立缓存: {e}")
+            return
+        if stored.get("key") != self.cacheKey:
+            ocrLogger.info("战备文件或相似度算法已变化，匹配缓存失效")
+            self.dirty = True
+            return
+        for text, name, similarity in stored.get("entries", [])[-self.capacity:]:
+            self.entries[text] = (name, similarity)
+        # 沿用上次会话的平均匹配耗时，本次会话全部命中时也能估算节省的时间
+        self.missSeconds = float(stored.get("averageMissSeconds", 0.0))
+        self.timedEntries = 1 if self.missSeconds else 0
+        ocrLogger.info(f"已加载匹配缓存 {len(self.entries)} 条")
+
+    def get(self, text, validNames=None):
+        """命中时返回 (战备名称, 相似度) 并标记为最近使用，未命中返回None
+
+        传入 validNames 时，缓存的战备名称不在其中（例如热重载后已删除）也视为未命中。
+        """
+        with self.lock:
+            result = self.entries.get(text)
+            if result is None or (validNames is not None and result[0] not in validNames):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(text)
+            self.hits += 1
+            return result
+
+    def peek(self, text, validNames=None):
+        """查看缓存条目，不计入命中统计也不改变LRU顺序；validNames 的含义与 get 相同"""
+        with self.lock:
+            result = self.entries.get(text)
+        if result is None or (validNames is not None and result[0] not in validNames):
+            return None
+        return result
+
+    def recordLookups(self, texts, hit):
+        """批量记录一组 peek 过的查找：hit 为True时计为命中并标记为最近使用，否则计为未命中"""
+        with self.lock:
+            for text in texts:
+                if hit and text in self.entries:
+                    self.entries.move_to_end(text)
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+    def put(self, text, result, elapsed=0.0):
+        """写入一条匹配结果，超出容量时淘汰最久未使用的条目"""
+        with self.lock:
+            self.entries[text] = tuple(result)
+            self.entries.move_to_end(text)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+            if elapsed:
+                self.missSeconds += elapsed
+                self.timedEntries += 1
+            self.dirty = True
+
+    def save(self):
+        """有新条目时写回磁盘（先写临时文件再替换，避免中途退出留下损坏的缓存）"""
+        with self.lock:
+            if not self.dirty:
+                return
+            stored = {"key": self.cacheKey,
+                      "averageMissSeconds": self.missSeconds / self.timedEntries if self.timedEntries else 0.0,
+                      "entries": [[text, name, similarity] for text, (name, similarity) in self.entries.items()]}
+            self.dirty = False
+        try:
+            tempPath = self.path + ".tmp"
+            with open(tempPath, 'w', encoding='utf-8') as f:
+                json.dump(stored, f, ensure_ascii=False)
+            os.replace(tempPath, self.path)
+        except Exception as e:
+            ocrLogger.warning(f"保存匹配缓存失败: {e}")
+
+    def getStats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            averageMiss = self.missSeconds / self.timedEntries if self.timedEntries else 0.0
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries),
+                    "hitRate": self.hits / lookups if lookups else 0.0,
+                    "savedSeconds": self.hits * averageMiss}
+
+
+matchMemoCache = None
+matchMemoCacheLock = threading.Lock()
+
+
+def getMatchMemoCache():
+    """返回当前战备文件对应的匹配缓存，未启用时或在OCR子进程中返回None
+
+    缓存只在主进程中使用：子进程里的副本不会随热重载更新，写入的条目也不会保存。
+    """
+    global matchMemoCache
+    if not basicConfig.get("match_cache", True) or multiprocessing.parent_process() is not None:
+        return None
+    with matchMemoCacheLock:
+        if matchMemoCache is None:
+            cacheKey = f"{basicConfig.get('similarity_kernel', 'bitparallel')}:{getAssetCatalog().sourceHash}"
+            matchMemoCache = MatchMemoCache(matchCachePath, basicConfig.get("match_cache_size", 4096), cacheKey)
+        return matchMemoCache
+
+
+def findAssetMatch(recognizedText, assetsData, knownResult=None):
+    """带持久化缓存的 find_most_similar：在全部战备名称中查找与识别文本最相似的一个
+
+    用于栏位的最终匹配，每个栏位只在这里计一次缓存查找，未命中时写入缓存。
+    knownResult 为提前结束判断时已经算好的匹配结果，未命中时直接使用，不再重复计算。
+    """
+    memo = getMatchMemoCache()
+    if memo is None:
+        return knownResult if knownResult is not None else find_most_similar(recognizedText, list(assetsData.keys()))
+    cached = memo.get(recognizedText, assetsData)
+    if cached is not None:
+        return cached
+    if knownResult is not None:
+        memo.put(recognizedText, knownResult)
+        return knownResult
+    startTime = time.perf_counter()
+    result = find_most_similar(recognizedText, list(assetsData.keys()))
+    memo.put(recognizedText, result, time.perf_counter() - startTime)
+    return result
+
+
+def peekAssetMatch(recognizedText, assetsData):
+    """与 findAssetMatch 结果相同，但不计入缓存统计也不写入缓存
+
+    用于每次PSM的提前结束判断和增量绑定的临时结果，同一栏位在一次识别中可能调用多次。
+    """
+    memo = getMatchMemoCache()
+    cached = memo.peek(recognizedText, assetsData) if memo is not None else None
+    if cached is not None:
+        return cached
+    return find_most_similar(recognizedText, list(assetsData.keys()))
+
+
+def closeMatchMemoCache():
+    """程序退出时输出缓存命中率和节省的匹配时间，并写回磁盘"""
+    if matchMemoCache is None:
+        return
+    stats = matchMemoCache.getStats()
+    ocrLogger.info(f"匹配缓存：命中 {stats['hits']} / 未命中 {stats['misses']}（命中率 {stats['hitRate']:.0%}），"
+                   f"约节省匹配时间 {stats['savedSeconds'] * 1000:.1f} ms，缓存 {stats['size']} 条")
+    matchMemoCache.save()
+
+
 def preprocessImage(imagePath):
     """优化图片预处理步骤，减少内存占用"""
     try:
@@ -289,7 +1228,6 @@ def preprocessImage(imagePath):
         imgEnhanced = enhancer.enhance(2.5)  # 进一步提高对比度
 
         # 应用锐化滤镜
-        from PIL import ImageFilter
         imgSharpened = imgEnhanced.filter(ImageFilter.SHARPEN)
 
         # 二值化处理，使用Otsu算法或自适应阈值
@@ -304,6 +1242,8 @@ def preprocessImage(imagePath):
 
 def preprocessImageFromMemory(image):
     """优化内存中图片预处理步骤，减少内存占用"""
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)  # 截图切片是NumPy视图
     try:
         # 图片预处理【增强中文识别率】：灰度化→提高对比度→二值化→反色，解决模糊/浅色文字识别不到的问题
         img = image.convert('L')
@@ -313,7 +1253,6 @@ def preprocessImageFromMemory(image):
         imgEnhanced = enhancer.enhance(2.5)  # 进一步提高对比度
 
         # 应用锐化滤镜
-        from PIL import ImageFilter
         imgSharpened = imgEnhanced.filter(ImageFilter.SHARPEN)
 
         # 二值化处理，使用Otsu算法或自适应阈值
@@ -325,90 +1264,753 @@ def preprocessImageFromMemory(image):
         # 返回原图作为备用
         return image.convert('L')
 
-def processImageFromMemory(image, imageName, assetsData, tesseractResults):
-    """处理内存中的图片：高清中文识别 → 清洗识别结果 → 相似度对比 → 控制台输出"""
+# ===================== 缓冲区池 =====================
+# 预处理每次F12都需要同样形状的几块数组，这里按 (形状, 类型) 复用，避免每次识别都重新分配；
+# 池中闲置缓冲区的总大小受 buffer_pool_mb 限制，超出预算的缓冲区直接交给垃圾回收。
+class BufferPool:
+    """按 (形状, 类型) 复用NumPy缓冲区的有界池"""
+
+    def __init__(self, budgetBytes):
+        self.budgetBytes = budgetBytes
+        self.freeBuffers = {}  # (形状, 类型) -> [缓冲区]
+        self.pooledBytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, shape, dtype):
+        """取出一块指定形状和类型的缓冲区（内容未初始化）"""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self.lock:
+            bucket = self.freeBuffers.get(key)
+            if bucket:
+                buffer = bucket.pop()
+                self.pooledBytes -= buffer.nbytes
+                self.hits += 1
+                return buffer
+            self.misses += 1
+        return np.empty(shape, dtype=dtype)
+
+    def release(self, buffer):
+        """归还缓冲区；视图或超出内存预算时不回收"""
+        if buffer is None or buffer.base is not None:
+            return
+        key = (buffer.shape, buffer.dtype.str)
+        with self.lock:
+            if self.pooledBytes + buffer.nbytes > self.budgetBytes:
+                return
+            self.freeBuffers.setdefault(key, []).append(buffer)
+            self.pooledBytes += buffer.nbytes
+
+    def getStats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "pooledBytes": self.pooledBytes}
+
+
+bufferPool = BufferPool(int(float(basicConfig.get("buffer_pool_mb", 16)) * 1024 * 1024))
+
+
+# ===================== NumPy批量预处理 =====================
+# 把所有栏位截图叠成一个 (N, H, W) 数组，一次完成灰度化→对比度增强→锐化→二值化，
+# 结果按栏位切片（视图，不复制）交给OCR阶段；各步骤与Pillow的实现逐像素对齐。
+contrastFactor = 2.5      # 与preprocessImageFromMemory中的对比度增强系数一致
+fixedThreshold = 230      # 固定阈值二值化：大于该值为白色
+
+
+def toGrayArray(image, out=None):
+    """把PIL图片或NumPy数组转换为uint8灰度数组，灰度公式与Pillow的convert('L')相同
+
+    传入 out 时结果写入 out（例如批量数组中的一张），中间计算使用缓冲区池。
+    """
+    if isinstance(image, Image.Image):
+        gray = np.asarray(image.convert('L'))
+    else:
+        array = np.asarray(image)
+        if array.ndim == 2:
+            gray = array.astype(np.uint8, copy=False)
+        else:
+            weighted = bufferPool.acquire(array.shape[:2], np.uint32)
+            channel = bufferPool.acquire(array.shape[:2], np.uint32)
+            np.multiply(array[..., 0], 19595, out=weighted, dtype=np.uint32)
+            np.multiply(array[..., 1], 38470, out=channel, dtype=np.uint32)
+            weighted += channel
+            np.multiply(array[..., 2], 7471, out=channel, dtype=np.uint32)
+            weighted += channel
+            weighted += 0x8000
+            weighted >>= 16
+            if out is None:
+                out = np.empty(array.shape[:2], dtype=np.uint8)
+            np.copyto(out, weighted, casting='unsafe')
+            bufferPool.release(weighted)
+            bufferPool.release(channel)
+            return out
+    if out is None:
+        return gray
+    np.copyto(out, gray)
+    return out
+
+
+def imageShape(image):
+    """返回截图的 (高, 宽)"""
+    if isinstance(image, Image.Image):
+        return image.size[1], image.size[0]
+    return np.shape(image)[:2]
+
+
+def otsuThresholds(batch):
+    """对批量灰度图逐张计算Otsu阈值，返回形状为 (N,) 的阈值数组"""
+    count = batch.shape[0]
+    flat = batch.reshape(count, -1)
+    offsets = (np.arange(count, dtype=np.intp) * 256)[:, None]
+    histograms = np.bincount((flat + offsets).ravel(), minlength=count * 256).reshape(count, 256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weightBackground = np.cumsum(histograms, axis=1)
+    weightForeground = flat.shape[1] - weightBackground
+    cumulativeSum = np.cumsum(histograms * levels, axis=1)
+    totalSum = cumulativeSum[:, -1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        meanBackground = cumulativeSum / weightBackground
+        meanForeground = (totalSum - cumulativeSum) / weightForeground
+        betweenVariance = weightBackground * weightForeground * (meanBackground - meanForeground) ** 2
+    betweenVariance = np.nan_to_num(betweenVariance)
+    return betweenVariance.argmax(axis=1)
+
+
+def preprocessBatch(images, thresholdMode=None):
+    """批量预处理所有截图，返回 (二值化后的 (N, H, W) 数组, 每个栏位的视图列表)
+
+    所有截图尺寸相同（同一组栏位截图）时一次性向量化处理；thresholdMode 为 "fixed"（阈值230）或 "otsu"。
+    返回的数组来自缓冲区池，OCR结束后应调用 bufferPool.release 归还。
+    """
+    if thresholdMode is None:
+        thresholdMode = basicConfig.get("preprocess_threshold", "fixed")
+    if not images:
+        return np.empty((0, 0, 0), dtype=np.uint8), []
+    shapes = {imageShape(image) for image in images}
+    if len(shapes) != 1:
+        raise ValueError("批量预处理要求所有截图尺寸相同")
+    batchShape = (len(images),) + shapes.pop()
+
+    gray = bufferPool.acquire(batchShape, np.uint8)
+    for i, image in enumerate(images):
+        toGrayArray(image, out=gray[i])
+
+    # 对比度增强：以每张图的平均灰度为中心拉伸，等价于 ImageEnhance.Contrast(img).enhance(2.5)
+    # Pillow先按浮点计算再截断取整，系数为2.5时可用整数 (2*均值 + 5*(像素-均值)) // 2 = (5*像素 - 3*均值) // 2 精确复现
+    means = np.floor(gray.mean(axis=(1, 2), dtype=np.float64) + 0.5).astype(np.int16)[:, None, None]
+    enhanced = bufferPool.acquire(batchShape, np.int16)
+    np.multiply(gray, int(contrastFactor * 2), out=enhanced, dtype=np.int16)
+    enhanced -= (int(contrastFactor * 2) - 2) * means
+    np.floor_divide(enhanced, 2, out=enhanced)
+    np.clip(enhanced, 0, 255, out=enhanced)
+
+    # 锐化：3x3卷积核 [-2,-2,-2; -2,32,-2; -2,-2,-2] / 16，边缘一圈像素保持不变（与ImageFilter.SHARPEN相同）
+    sharpened = bufferPool.acquire(batchShape, np.int16)
+    np.copyto(sharpened, enhanced)
+    neighbourSum = None
+    if batchShape[1] >= 3 and batchShape[2] >= 3:
+        neighbourSum = bufferPool.acquire((batchShape[0], batchShape[1] - 2, batchShape[2] - 2), np.int16)
+        np.add(enhanced[:, :-2, :-2], enhanced[:, :-2, 1:-1], out=neighbourSum)
+        for neighbour in (enhanced[:, :-2, 2:], enhanced[:, 1:-1, :-2], enhanced[:, 1:-1, 2:],
+                          enhanced[:, 2:, :-2], enhanced[:, 2:, 1:-1], enhanced[:, 2:, 2:]):
+            neighbourSum += neighbour
+        center = sharpened[:, 1:-1, 1:-1]
+        np.multiply(enhanced[:, 1:-1, 1:-1], 16, out=center)
+        center -= neighbourSum
+        center += 4  # 四舍五入
+        np.floor_divide(center, 8, out=center)
+        np.clip(sharpened, 0, 255, out=sharpened)
+
+    # 二值化
+    if thresholdMode == "otsu":
+        thresholds = otsuThresholds(sharpened)[:, None, None]
+    else:
+        thresholds = fixedThreshold
+    mask = bufferPool.acquire(batchShape, np.bool_)
+    np.greater(sharpened, thresholds, out=mask)
+    binary = bufferPool.acquire(batchShape, np.uint8)
+    np.multiply(mask, 255, out=binary, dtype=np.uint8)
+
+    for buffer in (gray, enhanced, sharpened, neighbourSum, mask):
+        bufferPool.release(buffer)
+    return binary, [binary[i] for i in range(batchShape[0])]
+
+
+def comparePreprocessPaths(images):
+    """对比逐张Pillow预处理与批量预处理的结果，返回不一致像素的比例"""
+    binary, batchViews = preprocessBatch(images, "fixed")
+    mismatched = 0
+    total = 0
+    for image, view in zip(images, batchViews):
+        reference = np.asarray(preprocessImageFromMemory(image))
+        mismatched += int(np.count_nonzero(reference != view))
+        total += reference.size
+    bufferPool.release(binary)
+    return mismatched / total if total else 0.0
+
+
+def makeBenchmarkCrops(count=8, size=(290, 30)):
+    """生成带文字和噪点的合成截图，用于基准测试"""
+    rng = np.random.default_rng(12345)
+    crops = []
+    for i in range(count):
+        background = rng.integers(20, 90, size=(size[1], size[0], 3), dtype=np.uint8)
+        image = Image.fromarray(background, 'RGB')
+        draw = ImageDraw.Draw(image)
+        draw.text((6, 8), f"STRATAGEM {i} ORBITAL", fill=(235, 235, 225))
+        crops.append(image)
+    return crops
+
+
+def runPreprocessBenchmark(iterations=200):
+    """预处理微基准：逐张Pillow处理 vs NumPy批量处理，并校验两者结果一致"""
+    crops = makeBenchmarkCrops()
+    mismatchRatio = comparePreprocessPaths(crops)
+
+    startTime = time.perf_counter()
+    for _ in range(iterations):
+        for crop in crops:
+            preprocessImageFromMemory(crop)
+    pillowTime = (time.perf_counter() - startTime) / iterations
+
+    startTime = time.perf_counter()
+    for _ in range(iterations):
+        binary, _ = preprocessBatch(crops, "fixed")
+        bufferPool.release(binary)
+    batchTime = (time.perf_counter() - startTime) / iterations
+
+    print(f"预处理基准（{len(crops)} 张截图，{iterations} 轮）")
+    print(f"  逐张Pillow处理: {pillowTime * 1000:.3f} ms/轮")
+    print(f"  NumPy批量处理: {batchTime * 1000:.3f} ms/轮（{pillowTime / batchTime:.1f}x）")
+    print(f"  结果不一致像素比例: {mismatchRatio:.4%}")
+    return {"pillow": pillowTime, "batch": batchTime, "mismatchRatio": mismatchRatio}
+
+
+# ===================== OCR引擎（常驻Tesseract实例） =====================
+# pytesseract每次调用都会写临时图片、启动tesseract进程并重新加载语言模型；
+# 这里通过ctypes直接调用libtesseract的C API，语言模型只加载一次，之后的识别都在进程内完成。
+# 找不到libtesseract时自动回退到pytesseract。
+
+def parseTesseractTsv(tsvText):
+    """把tesseract输出的TSV文本解析成与 pytesseract.image_to_data(Output.DICT) 相同结构的字典"""
+    header = ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+              "left", "top", "width", "height", "conf", "text"]
+    data = {column: [] for column in header}
+    textIndex = len(header) - 1
+    for line in tsvText.splitlines():
+        if not line or line.startswith("level"):
+            continue  # 跳过空行和表头（C API输出不带表头，命令行输出带表头）
+        row = line.split("\t")
+        for i, column in enumerate(header):
+            value = row[i] if i < len(row) else ""
+            if i != textIndex:
+                try:
+                    value = int(float(value))
+                except ValueError:
+                    pass
+            data[column].append(value)
+    return data
+
+
+class PytesseractEngine:
+    """回退引擎：通过pytesseract调用tesseract命令行（每次调用启动一个进程）"""
+    name = "pytesseract"
+
+    def __init__(self, lang):
+        self.lang = lang
+
+    def imageToData(self, image, psm):
+        config = f'--oem 3 --psm {psm} -l {self.lang}'
+        return pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+
+    def imageToString(self, image):
+        return pytesseract.image_to_string(image, lang=self.lang)
+
+    def warmUp(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TesseractApiEngine:
+    """常驻引擎：通过ctypes调用libtesseract，每个实例只初始化一次语言模型，多个实例可供多线程并发使用"""
+    name = "libtesseract"
+
+    def __init__(self, lang, libraryPath, dataPath=None, instanceCount=1):
+        self.lang = lang
+        self.lib = ctypes.CDLL(libraryPath)
+        self._declareApi()
+        self.dataPath = dataPath
+        self.handles = queue.Queue()
+        self.allHandles = []
+        for _ in range(max(1, instanceCount)):
+            handle = self._createHandle()
+            self.allHandles.append(handle)
+            self.handles.put(handle)
+
+    def _declareApi(self):
+        lib = self.lib
+        lib.TessBaseAPICreate.restype = ctypes.c_void_p
+        lib.TessBaseAPIInit3.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPIInit3.restype = ctypes.c_int
+        lib.TessBaseAPISetPageSegMode.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPISetImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int,
+                                            ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        lib.TessBaseAPISetSourceResolution.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPIRecognize.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+        lib.TessBaseAPIRecognize.restype = ctypes.c_int
+        lib.TessBaseAPIGetTSVText.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.TessBaseAPIGetTSVText.restype = ctypes.c_void_p  # 需要用TessDeleteText释放，不能用c_char_p
+        lib.TessBaseAPIGetUTF8Text.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p
+        lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIClear.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIEnd.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIDelete.argtypes = [ctypes.c_void_p]
+
+    def _createHandle(self):
+        handle = self.lib.TessBaseAPICreate()
+        dataPath = self.dataPath.encode('utf-8') if self.dataPath else None
+        if self.lib.TessBaseAPIInit3(handle, dataPath, self.lang.encode('utf-8')) != 0:
+            self.lib.TessBaseAPIDelete(handle)
+            raise RuntimeError(f"libtesseract 初始化语言 {self.lang} 失败")
+        return handle
+
+    def _takeText(self, textPointer):
+        if not textPointer:
+            return ""
+        try:
+            return ctypes.string_at(textPointer).decode('utf-8', errors='replace')
+        finally:
+            self.lib.TessDeleteText(textPointer)
+
+    def _recognize(self, image, psm, getText):
+        # 接受PIL图片或NumPy数组（批量预处理的视图），只传8位灰度或RGB数据的指针，不复制像素
+        if isinstance(image, Image.Image) and image.mode not in ("L", "RGB"):
+            image = image.convert("L")
+        pixels = np.ascontiguousarray(image, dtype=np.uint8)  # 识别结束前必须保持引用
+        height, width = pixels.shape[:2]
+        bytesPerPixel = 1 if pixels.ndim == 2 else pixels.shape[2]
+        handle = self.handles.get()
+        try:
+            self.lib.TessBaseAPISetPageSegMode(handle, psm)
+            self.lib.TessBaseAPISetImage(handle, pixels.ctypes.data, width, height, bytesPerPixel, width * bytesPerPixel)
+            self.lib.TessBaseAPISetSourceResolution(handle, 70)  # 与命令行在缺少DPI信息时的默认值一致
+            if self.lib.TessBaseAPIRecognize(handle, None) != 0:
+                raise RuntimeError(f"libtesseract 识别失败 (psm {psm})")
+            return getText(handle)
+        finally:
+            self.lib.TessBaseAPIClear(handle)
+            self.handles.put(handle)
+
+    def imageToData(self, image, psm):
+        tsvText = self._recognize(image, psm, lambda handle: self._takeText(self.lib.TessBaseAPIGetTSVText(handle, 0)))
+        return parseTesseractTsv(tsvText)
+
+    def imageToString(self, image):
+        return self._recognize(image, 3, lambda handle: self._takeText(self.lib.TessBaseAPIGetUTF8Text(handle)))
+
+    def warmUp(self):
+        """用一张空白图片在每个实例上跑一次识别，完成模型和内部缓存的首次加载"""
+        blank = Image.new("L", (290, 30), 0)
+        for _ in self.allHandles:
+            self.imageToData(blank, 7)
+
+    def close(self):
+        for handle in self.allHandles:
+            try:
+                self.lib.TessBaseAPIEnd(handle)
+                self.lib.TessBaseAPIDelete(handle)
+            except Exception:
+                pass
+        self.allHandles = []
+
+
+class TesseractBatchEngine(PytesseractEngine):
+    """批量引擎：把所有栏位截图写成未压缩的PGM放到内存文件系统，每个PSM只启动一次tesseract处理整个列表"""
+    name = "batch"
+
+    def __init__(self, lang):
+        super().__init__(lang)
+        # Linux上优先使用tmpfs（/dev/shm），避免写磁盘
+        self.tempRoot = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+    def imageToDataBatch(self, images, psm):
+        """批量识别，返回与 images 顺序一致的 image_to_data 字典列表"""
+        with tempfile.TemporaryDirectory(prefix="helldiver_ocr_", dir=self.tempRoot) as workDir:
+            imagePaths = []
+            for i, image in enumerate(images):
+                imagePath = os.path.join(workDir, f"slot{i}.pgm")
+                pixels = np.ascontiguousarray(toGrayArray(image))
+                with open(imagePath, "wb") as f:
+                    # PGM(P5) 格式：简单文本头 + 原始灰度像素，tesseract(leptonica)可直接读取
+                    f.write(f"P5\n{pixels.shape[1]} {pixels.shape[0]}\n255\n".encode("ascii"))
+                    f.write(pixels.tobytes())
+                imagePaths.append(imagePath)
+            listPath = os.path.join(workDir, "slots.txt")
+            with open(listPath, "w", encoding="utf-8") as f:
+                f.write("\n".join(imagePaths) + "\n")
+
+            command = [pytesseract.pytesseract.tesseract_cmd, listPath, "stdout",
+                       "--oem", "3", "--psm", str(psm), "-l", self.lang, "tsv"]
+            startupInfo = None
+            if sys.platform == "win32":
+                # 与pytesseract一致：不弹出控制台窗口
+                startupInfo = subprocess.STARTUPINFO()
+                startupInfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            completed = subprocess.run(command, capture_output=True, startupinfo=startupInfo)
+            if completed.returncode != 0:
+                raise RuntimeError(completed.stderr.decode("utf-8", errors="replace").strip())
+
+        # 多页TSV用 page_num 区分每张图片（从1开始）
+        allData = parseTesseractTsv(completed.stdout.decode("utf-8", errors="replace"))
+        pages = [{column: [] for column in allData} for _ in images]
+        for row in range(len(allData["page_num"])):
+            pageIndex = allData["page_num"][row] - 1
+            if 0 <= pageIndex < len(pages):
+                for column, values in allData.items():
+                    pages[pageIndex][column].append(values[row])
+        return pages
+
+    def imageToData(self, image, psm):
+        return self.imageToDataBatch([image], psm)[0]
+
+
+def findTesseractLibrary():
+    """查找libtesseract动态库：优先使用配置 tesseract_library，其次系统库路径，最后是tesseract可执行文件所在目录"""
+    configuredPath = basicConfig.get("tesseract_library", "")
+    if configuredPath:
+        return configuredPath
+    libraryPath = ctypes.util.find_library("tesseract")
+    if libraryPath:
+        return libraryPath
+    tesseractExe = shutil.which(pytesseract.pytesseract.tesseract_cmd) or shutil.which("tesseract")
+    if tesseractExe:
+        exeDir = os.path.dirname(os.path.abspath(tesseractExe))
+        for fileName in sorted(os.listdir(exeDir), reverse=True):
+            lowerName = fileName.lower()
+            if lowerName.endswith(".dll") and (lowerName.startswith("libtesseract") or lowerName.startswith("tesseract")):
+                return os.path.join(exeDir, fileName)
+    return None
+
+
+def findTessdataDir():
+    """查找tessdata目录：TESSDATA_PREFIX 未设置时，尝试tesseract可执行文件旁边的tessdata"""
+    if os.environ.get("TESSDATA_PREFIX"):
+        return None  # 交给libtesseract自己读取环境变量
+    tesseractExe = shutil.which(pytesseract.pytesseract.tesseract_cmd) or shutil.which("tesseract")
+    if tesseractExe:
+        candidate = os.path.join(os.path.dirname(os.path.abspath(tesseractExe)), "tessdata")
+        if os.path.isdir(candidate):
+            return candidate
+    return None
+
+
+ocrEngine = None
+ocrEngineLock = threading.Lock()
+
+
+def isBatchOcrEngine():
+    """是否配置为批量tesseract引擎；只看配置，不为了选择识别路径而在本进程创建OCR引擎"""
+    return basicConfig.get("ocr_engine", "auto") == "batch"
+
+
+def getOcrEngine():
+    """获取当前进程的OCR引擎（首次调用时创建），配置 ocr_engine 可选 auto/libtesseract/batch/pytesseract"""
+    global ocrEngine
+    if ocrEngine is not None:
+        return ocrEngine
+    with ocrEngineLock:
+        if ocrEngine is not None:
+            return ocrEngine
+        ocrLang = basicConfig.get("ocr_language", "chi_sim")
+        engineName = basicConfig.get("ocr_engine", "auto")
+        engine = None
+        if engineName == "batch":
+            engine = TesseractBatchEngine(ocrLang)
+            ocrLogger.info("使用批量tesseract进程作为OCR引擎")
+        if engineName in ("auto", "libtesseract"):
+            try:
+                libraryPath = findTesseractLibrary()
+                if not libraryPath:
+                    raise FileNotFoundError("未找到libtesseract动态库")
+                instanceCount = int(basicConfig.get("ocr_engine_instances", 1) or 1)
+                engine = TesseractApiEngine(ocrLang, libraryPath, findTessdataDir(), instanceCount)
+                ocrLogger.info(f"已加载常驻OCR引擎：{libraryPath}（实例数 {instanceCount}）")
+            except Exception as e:
+                ocrLogger.warning(f"无法使用libtesseract，回退到pytesseract: {e}")
+        if engine is None:
+            engine = PytesseractEngine(ocrLang)
+            ocrLogger.info("使用pytesseract作为OCR引擎")
+        ocrEngine = engine
+        return ocrEngine
+
+
+def warmUpOcrEngine():
+    """创建OCR引擎并执行一次预热识别，供启动时在后台线程调用"""
+    try:
+        startTime = time.perf_counter()
+        getOcrEngine().warmUp()
+        ocrLogger.info(f"OCR引擎预热完成，耗时 {(time.perf_counter() - startTime) * 1000:.1f} ms")
+    except Exception as e:
+        ocrLogger.warning(f"OCR引擎预热失败: {e}")
+
+
+# ===================== 自适应PSM调度 =====================
+# 记录每个栏位、每种语言上哪种PSM识别效果最好，下次按该顺序尝试；
+# 一旦识别结果的置信度和与战备库的相似度都足够高，就不再尝试剩余的PSM。
+defaultPsmOrder = (6, 13, 7, 8)  # 默认配置 / 纯文字行 / 单行 / 单词
+
+
+class PsmScheduler:
+    """按历史胜出次数排序PSM，并统计实际执行和提前结束节省的识别次数"""
+
+    def __init__(self, defaultOrder=defaultPsmOrder):
+        self.defaultOrder = tuple(defaultOrder)
+        self.winCounts = {}  # (栏位, 语言) -> {psm: 胜出次数}
+        self.passesRun = 0
+        self.passesSaved = 0
+        self.earlyExits = 0
+        self.blankSlots = 0
+        self.passesSkipped = 0
+        self.lock = threading.Lock()
+
+    def orderFor(self, slotName, lang):
+        """返回该栏位、语言下的PSM尝试顺序：胜出次数多的在前，次数相同保持默认顺序"""
+        with self.lock:
+            counts = self.winCounts.get((slotName, lang))
+            if not counts:
+                return self.defaultOrder
+            return tuple(sorted(self.defaultOrder, key=lambda psm: -counts.get(psm, 0)))
+
+    def record(self, slotName, lang, winningPsm, passesRun, earlyExit):
+        """记录一次识别的胜出PSM和执行次数"""
+        with self.lock:
+            if winningPsm is not None:
+                counts = self.winCounts.setdefault((slotName, lang), {})
+                counts[winningPsm] = counts.get(winningPsm, 0) + 1
+            self.passesRun += passesRun
+            self.passesSaved += max(0, len(self.defaultOrder) - passesRun)
+            if earlyExit:
+                self.earlyExits += 1
+
+    def recordBlank(self, slotCount):
+        """记录被判定为空栏位、完全跳过OCR的栏位数（每个栏位省下全部PSM的识别）"""
+        with self.lock:
+            self.blankSlots += slotCount
+            self.passesSkipped += slotCount * len(self.defaultOrder)
+
+    def getStats(self):
+        with self.lock:
+            return {
+                "passesRun": self.passesRun,
+                "passesSaved": self.passesSaved,
+                "earlyExits": self.earlyExits,
+                "blankSlots": self.blankSlots,
+                "passesSkipped": self.passesSkipped,
+            }
+
+
+psmScheduler = PsmScheduler()
+
+
+def cleanRecognizedText(text):
+    """清洗识别结果：去掉换行/空格/制表符"""
+    return text.replace('\n', '').replace('\r', '').replace(' ', '').replace('\t', '').strip()
+
+
+def isConfidentMatch(averageConfidence, similarity):
+    """判断一次识别是否足够可靠，可以跳过剩余的PSM"""
+    minConfidence = basicConfig.get("ocr_early_exit_confidence", 80)
+    minSimilarity = basicConfig.get("ocr_early_exit_similarity", 0.9)
+    return averageConfidence >= minConfidence and similarity >= minSimilarity
+
+
+def evaluateOcrPass(data, assetsData):
+    """从一次 image_to_data 结果中提取高置信度文本，并判断能否提前结束
+
+    返回 (识别文本, 匹配结果)；匹配结果仅在置信度和相似度都足够高时为 (战备名称, 相似度)，否则为None。
+    """
+    # 过滤出可信度高的文本 - 使用列表推导式优化
+    confidentWords = [
+        (text.strip(), conf)
+        for text, conf in ((text, int(data['conf'][i]) if data['conf'][i] != '' else 0)
+                           for i, text in enumerate(data['text']))
+        if text.strip() and conf > 30
+    ]
+
+    currentResult = ''.join(text for text, _ in confidentWords)
+
+    if currentResult and assetsData:
+        averageConfidence = sum(conf for _, conf in confidentWords) / len(confidentWords)
+        candidate, similarity = peekAssetMatch(cleanRecognizedText(currentResult), assetsData)
+        if candidate and isConfidentMatch(averageConfidence, similarity):
+            return currentResult, (candidate, similarity)
+    return currentResult, None
+
+
+def matchRecognizedText(imageName, recognizedText, assetsData, tesseractResults, earlyMatch=None, assigned=False):
+    """把清洗后的识别文本与战备库做相似度匹配，输出到控制台并写入 tesseractResults
+
+    earlyMatch 为提前结束时算好的最佳匹配；assigned 为True时 earlyMatch 是一对一匹配分配的结果，
+    已在一对一匹配中记录缓存查找，直接采用。
+    """
+    # ======== 控制台格式化输出核心结果 ========
+    print("-" * 60)
+    print(f"[IMG] 处理图片：{imageName}")
+    print(f"[TXT] 图片识别出的中文：{recognizedText if recognizedText else '【无识别结果】'}")
+
+    # 相似度匹配+输出
+    if recognizedText and assetsData:
+        if assigned:
+            mostSimilarText, similarity = earlyMatch
+        else:
+            mostSimilarText, similarity = findAssetMatch(recognizedText, assetsData, earlyMatch)
+
+        if mostSimilarText:
+            print(f"[SUCCESS] 最相似的文本（JSON左侧）：{mostSimilarText} (相似度: {similarity:.2f})")
+            ocrLogger.info(f"图片 {imageName} 识别成功: {mostSimilarText} (相似度: {similarity:.2f})")
+            # 获取最相似文本对应的字段
+            if mostSimilarText in assetsData:
+                correspondingField = assetsData[mostSimilarText]
+                # 将识别结果添加到有序字典中
+                tesseractResults[imageName] = {mostSimilarText: correspondingField}
+            else:
+                ocrLogger.warning(f"未在 assetsData 中找到对应字段：{mostSimilarText}")
+                # 即使没找到对应字段也记录识别结果
+                tesseractResults[imageName] = {mostSimilarText: ""}
+        else:
+            print(f"[FAILED] 未找到相似文本 (最高相似度: {similarity:.2f})")
+            ocrLogger.info(f"图片 {imageName} 未找到匹配项 (最高相似度: {similarity:.2f})")
+            # 当完全找不到相似文本时，仍然记录识别结果，但使用原始识别文本作为键
+            tesseractResults[imageName] = {recognizedText: ""}
+    elif not assetsData:
+        print("[FAILED] 未加载到JSON中的中文对比文本")
+        ocrLogger.warning("未加载到JSON中的中文对比文本")
+    else:
+        print("[SKIPPED] 图片未识别到有效中文，跳过匹配")
+        ocrLogger.info(f"图片 {imageName} 未识别到有效中文")
+        # 记录空识别结果
+        tesseractResults[imageName] = {"": ""}
+
+
+def matchSlotsOneToOne(recognizedTexts, assetsData, tesseractResults, excludedNames=()):
+    """批量匹配阶段：一次算出 栏位 × 战备 相似度矩阵，并保证每个战备在一套配装中最多被一个栏位使用
+
+    recognizedTexts 为 {截图名称: 清洗后的识别文本}，excludedNames 为已被其他栏位（如复用结果）占用的战备。
+    结果按 matchRecognizedText 的格式写入 tesseractResults，返回 {截图名称: (战备名称, 相似度)}。
+    """
+    excludedNames = set(excludedNames)
+    # 始终在完整的战备列表上计算（直接使用战备目录中编译好的索引），被占用的战备在矩阵中屏蔽
+    names = list(assetsData)
+    textSlots = [(imageName, text) for imageName, text in recognizedTexts.items() if text]
+    assignments = {}
+
+    # 所有栏位都命中匹配缓存、且命中的战备互不相同也未被占用时，不需要计算相似度矩阵
+    memo = getMatchMemoCache()
+    if memo is not None and textSlots:
+        # 先只查看不计数，确实走捷径时才记为命中，否则全部栏位都要计算矩阵，记为未命中
+        cachedMatches = [memo.peek(text) for _, text in textSlots]
+        cachedNames = [match[0] if match else None for match in cachedMatches]
+        shortcut = (all(cachedMatches) and len(set(cachedNames)) == len(cachedNames)
+                    and not excludedNames.intersection(cachedNames)
+                    and all(name in assetsData for name in cachedNames))
+        memo.recordLookups([text for _, text in textSlots], shortcut)
+        if shortcut:
+            assignments = {imageName: match for (imageName, _), match in zip(textSlots, cachedMatches)}
+            textSlots = []
+
+    if names and textSlots:
+        matchStart = time.perf_counter()
+        matcher = getAssetNgramIndex(names)
+        matrix = matcher.similarityMatrix([text for _, text in textSlots])
+        # 不受一对一约束和占用限制的最佳匹配，写入匹配缓存
+        bestColumns = matrix.argmax(axis=1)
+        excludedColumns = [column for column, name in enumerate(names) if name in excludedNames]
+        allowed = matrix.copy()
+        allowed[:, excludedColumns] = -np.inf
+        columns = assignOneToOne(allowed)
+        for row, (imageName, _) in enumerate(textSlots):
+            column = columns[row]
+            assignments[imageName] = (names[column], float(matrix[row, column])) if column >= 0 else (None, 0.0)
+        conflicts = sum(1 for row, column in enumerate(columns) if column != bestColumns[row])
+        matchElapsed = time.perf_counter() - matchStart
+        ocrLogger.info(f"一对一匹配 {len(textSlots)} 个栏位 × {len(names) - len(excludedColumns)} 个战备耗时: "
+                       f"{matchElapsed * 1000:.2f} ms（{conflicts} 个栏位因冲突改选）")
+        if memo is not None:
+            for row, (_, text) in enumerate(textSlots):
+                bestColumn = int(bestColumns[row])
+                memo.put(text, (names[bestColumn], float(matrix[row, bestColumn])), matchElapsed / len(textSlots))
+
+    for imageName, text in recognizedTexts.items():
+        matchRecognizedText(imageName, text, assetsData, tesseractResults, assignments.get(imageName, (None, 0.0)),
+                            assigned=True)
+    return assignments
+
+
+def processImageFromMemory(image, imageName, assetsData, tesseractResults, psmOrder=None, preprocessed=False,
+                           deferMatch=False):
+    """处理内存中的图片：高清中文识别 → 清洗识别结果 → 相似度对比 → 控制台输出
+
+    preprocessed 为True时，image 已是批量预处理得到的二值化数组，直接交给OCR引擎。
+    deferMatch 为True时只识别不匹配，由调用方对所有栏位统一做一对一匹配。
+    返回本次识别的PSM信息 {"psm": 胜出的PSM, "passes": 执行次数, "earlyExit": 是否提前结束, "text": 识别文本}，
+    供调用方更新PSM调度器（进程池模式下调度器位于主进程）。
+    """
     imgBinary = None
+    ocrInfo = {"psm": None, "passes": 0, "earlyExit": False, "text": ""}
     try:
         ocrLogger.info(f"处理图片: {imageName}")
         # 图片预处理
-        imgBinary = preprocessImageFromMemory(image)
+        imgBinary = image if preprocessed else preprocessImageFromMemory(image)
 
         # 从配置文件获取OCR语言设置
         ocrLang = basicConfig.get("ocr_language", "chi_sim")
 
-        # 使用多种OCR配置尝试识别，选择最佳结果
-        configs = [
-            f'--oem 3 --psm 6 -l {ocrLang}',  # 默认配置
-            f'--oem 3 --psm 13 -l {ocrLang}', # 纯文字行
-            f'--oem 3 --psm 7 -l {ocrLang}',  # 单行
-            f'--oem 3 --psm 8 -l {ocrLang}'   # 单词
-        ]
+        # 按调度器给出的顺序尝试多种页面分割模式（PSM），选择最佳结果
+        if psmOrder is None:
+            psmOrder = psmScheduler.orderFor(imageName, ocrLang)
 
+        engine = getOcrEngine()
         bestResult = ""
+        earlyMatch = None  # 提前结束时的匹配结果，避免后面重复计算相似度
 
-        for config in configs:
+        for psm in psmOrder:
             try:
                 # 获取带有置信度的识别结果
-                data = pytesseract.image_to_data(imgBinary, config=config, output_type=pytesseract.Output.DICT)
+                ocrInfo["passes"] += 1
+                data = engine.imageToData(imgBinary, psm)
 
-                # 过滤出可信度高的文本 - 使用列表推导式优化
-                textParts = [
-                    text.strip()
-                    for i, text in enumerate(data['text'])
-                    if text.strip() and (int(data['conf'][i]) if data['conf'][i] != '' else 0) > 30
-                ]
-
-                currentResult = ''.join(textParts)
+                currentResult, passMatch = evaluateOcrPass(data, assetsData)
 
                 if len(currentResult) > len(bestResult):
                     bestResult = currentResult
+                    ocrInfo["psm"] = psm
+
+                # 置信度和相似度都足够高时提前结束，不再尝试剩余的PSM
+                if passMatch:
+                    bestResult = currentResult
+                    ocrInfo["psm"] = psm
+                    ocrInfo["earlyExit"] = True
+                    earlyMatch = passMatch
+                    break
 
             except Exception as e:
-                ocrLogger.warning(f"OCR配置 {config} 失败: {e}")
+                ocrLogger.warning(f"OCR配置 --oem 3 --psm {psm} -l {ocrLang} 失败: {e}")
                 continue  # 如果某个配置失败，继续尝试下一个
 
         # 如果所有配置都失败，使用基本识别
         if not bestResult:
-            recognizedText = pytesseract.image_to_string(imgBinary, lang=ocrLang)
+            recognizedText = engine.imageToString(imgBinary)
             bestResult = recognizedText
 
         # 清洗识别结果：去掉换行/空格/制表符，只保留纯中文文本
-        recognizedText = bestResult.replace('\n', '').replace('\r', '').replace(' ', '').replace('\t', '').strip()
-
-        # ======== 控制台格式化输出核心结果 ========
-        print("-" * 60)
-        print(f"[IMG] 处理图片：{imageName}")
-        print(f"[TXT] 图片识别出的中文：{recognizedText if recognizedText else '【无识别结果】'}")
-
-        # 相似度匹配+输出
-        if recognizedText and assetsData:
-            mostSimilarText, similarity = find_most_similar(recognizedText, list(assetsData.keys()))
-
-            if mostSimilarText:
-                print(f"[SUCCESS] 最相似的文本（JSON左侧）：{mostSimilarText} (相似度: {similarity:.2f})")
-                ocrLogger.info(f"图片 {imageName} 识别成功: {mostSimilarText} (相似度: {similarity:.2f})")
-                # 获取最相似文本对应的字段
-                if mostSimilarText in assetsData:
-                    correspondingField = assetsData[mostSimilarText]
-                    # 将识别结果添加到有序字典中
-                    tesseractResults[imageName] = {mostSimilarText: correspondingField}
-                else:
-                    ocrLogger.warning(f"未在 assetsData 中找到对应字段：{mostSimilarText}")
-                    # 即使没找到对应字段也记录识别结果
-                    tesseractResults[imageName] = {mostSimilarText: ""}
-            else:
-                print(f"[FAILED] 未找到相似文本 (最高相似度: {similarity:.2f})")
-                ocrLogger.info(f"图片 {imageName} 未找到匹配项 (最高相似度: {similarity:.2f})")
-                # 当完全找不到相似文本时，仍然记录识别结果，但使用原始识别文本作为键
-                tesseractResults[imageName] = {recognizedText: ""}
-        elif not assetsData:
-            print("[FAILED] 未加载到JSON中的中文对比文本")
-            ocrLogger.warning("未加载到JSON中的中文对比文本")
-        else:
-            print("[SKIPPED] 图片未识别到有效中文，跳过匹配")
-            ocrLogger.info(f"图片 {imageName} 未识别到有效中文")
-            # 记录空识别结果
-            tesseractResults[imageName] = {"": ""}
+        recognizedText = cleanRecognizedText(bestResult)
+        ocrInfo["text"] = recognizedText
+
+        if not deferMatch:
+            matchRecognizedText(imageName, recognizedText, assetsData, tesseractResults, earlyMatch)
 
     except Exception as e:
         ocrLogger.error(f"处理图片 {imageName} 失败：{str(e)}")
@@ -416,69 +2018,890 @@ def processImageFromMemory(image, imageName, assetsData, tesseractResults):
         tesseractResults[imageName] = {"": ""}
     finally:
         # 释放图片资源
-        if imgBinary:
+        if isinstance(imgBinary, Image.Image) and not preprocessed:
             imgBinary.close()
-            imgBinary = None  # 清除引用
-        # 强制垃圾回收
-        gc.collect()
+        imgBinary = None  # 清除引用
+    return ocrInfo
 
-def captureScreenshotsToMemory():
-    """一次性捕捉所有截图并保存在内存中，减少系统调用"""
-    screenshotLogger.info("开始截图流程")
-    screenshots = []  # 用于存储内存中的截图
+# ===================== 栏位布局 =====================
+# 战备栏位几何参数按分辨率保存：2560x1440为内置基准布局；其他分辨率先按屏幕高度等比缩放，
+# 首次F12时截取更大的区域，按行投影找到文字行，校准起始位置和行距后缓存到 Config/layout_profiles.json
+
+SlotLayout = namedtuple("SlotLayout", "left top width height pitch count source")
+
+referenceResolution = (2560, 1440)
+referenceLayout = SlotLayout(150, 108, 290, 30, 70, 8, "builtin")  # 栏位宽290、高30，相邻栏位纵向间距70
+layoutProfilesPath = os.path.join(configDir, "layout_profiles.json")
+layoutProfiles = None
+layoutProfilesLock = threading.Lock()
+
+
+def loadLayoutProfiles():
+    """读取已校准的布局 {"宽x高": SlotLayout}，文件不存在或损坏时返回空字典"""
+    try:
+        with open(layoutProfilesPath, 'r', encoding='utf-8') as f:
+            stored = json.load(f)
+        return {resolution: SlotLayout(**profile) for resolution, profile in stored.items()}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        screenshotLogger.warning(f"读取栏位布局失败，重新校准: {e}")
+        return {}
+
+
+def saveLayoutProfile(resolution, layout):
+    """写入一个分辨率的布局（先写临时文件再替换）"""
+    with layoutProfilesLock:
+        layoutProfiles[resolution] = layout
+        stored = {key: profile._asdict() for key, profile in layoutProfiles.items()}
     try:
-        # 按住Ctrl键
-        pyautogui.keyDown('ctrl')
-        time.sleep(0.1)  # 减少延迟
+        tempPath = layoutProfilesPath + ".tmp"
+        with open(tempPath, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=4)
+        os.replace(tempPath, layoutProfilesPath)
+    except Exception as e:
+        screenshotLogger.warning(f"保存栏位布局失败: {e}")
+
+
+def scaleLayout(screenWidth, screenHeight):
+    """按屏幕高度等比缩放基准布局（起始X仍按宽度比例），作为未校准分辨率的初始估计"""
+    scale = screenHeight / referenceResolution[1]
+    return SlotLayout(round(screenWidth * 0.05859), round(screenHeight * 0.075),
+                      round(referenceLayout.width * scale), round(referenceLayout.height * scale),
+                      round(referenceLayout.pitch * scale), referenceLayout.count, "scaled")
+
+
+def getSlotLayout():
+    """返回当前分辨率的栏位布局：已校准的缓存 > 内置基准 > 等比缩放（source 为 "scaled"，需要校准）"""
+    global layoutProfiles
+    screenWidth = basicConfig.get("screen_width", 2560)
+    screenHeight = basicConfig.get("screen_height", 1440)
+    with layoutProfilesLock:
+        if layoutProfiles is None:
+            layoutProfiles = loadLayoutProfiles()
+        layout = layoutProfiles.get(f"{screenWidth}x{screenHeight}")
+    if layout is not None:
+        return layout
+    if (screenWidth, screenHeight) == referenceResolution:
+        return referenceLayout
+    return scaleLayout(screenWidth, screenHeight)
+
+
+def getCalibrationRegion(layout):
+    """校准用的截图区域：在估计的栏位区域上下各多截一个行距"""
+    return (layout.left, max(0, layout.top - layout.pitch), layout.width,
+            (layout.count + 1) * layout.pitch + layout.height)
+
+
+def findTextRows(frame, minHeight):
+    """行投影：每行相邻像素的平均灰度差（文字笔画多的行数值高），返回文字行 [(起始行, 结束行)]"""
+    gray = frame.mean(axis=2, dtype=np.float32)
+    energy = np.abs(np.diff(gray, axis=1)).mean(axis=1)
+    threshold = energy.min() + (energy.max() - energy.min()) * 0.3
+    rows = []
+    start = None
+    for y, isText in enumerate(energy > threshold):
+        if isText and start is None:
+            start = y
+        elif not isText and start is not None:
+            rows.append((start, y))
+            start = None
+    if start is not None:
+        rows.append((start, len(energy)))
+    # 合并笔画间的细小断开，去掉过矮的噪声行
+    merged = []
+    for row in rows:
+        if merged and row[0] - merged[-1][1] <= max(2, minHeight // 3):
+            merged[-1] = (merged[-1][0], row[1])
+        else:
+            merged.append(row)
+    return [row for row in merged if row[1] - row[0] >= minHeight]
+
+
+def calibrateLayout(frame, regionTop, estimate):
+    """在校准区域的截图中找到文字行，校准行距和第一个栏位的位置，失败时返回None"""
+    rows = findTextRows(frame, max(3, estimate.height // 4))
+    if len(rows) < 3:
+        return None
+    centers = [(start + end) / 2 for start, end in rows]
+    # 行距：相邻文字行的间隔（中间有空栏位时按估计行距折算）
+    pitches = []
+    for previous, current in zip(centers, centers[1:]):
+        steps = round((current - previous) / estimate.pitch)
+        if steps >= 1:
+            pitches.append((current - previous) / steps)
+    if not pitches:
+        return None
+    pitch = statistics.median(pitches)
+    if abs(pitch - estimate.pitch) > estimate.pitch * 0.25:
+        return None
+    # 第一个栏位的中心：把每一行折算回第一个栏位，取中位数
+    expectedFirst = estimate.top - regionTop + estimate.height / 2
+    firstCenter = statistics.median(center - round((center - expectedFirst) / pitch) * pitch for center in centers)
+    if abs(firstCenter - expectedFirst) > pitch / 2:
+        return None
+    height = round(pitch * referenceLayout.height / referenceLayout.pitch)
+    top = round(firstCenter - height / 2)
+    # 校准后的全部栏位必须落在截取的画面内，否则最后几个栏位的切片会被截短
+    if top < 0 or top + (estimate.count - 1) * round(pitch) + height > frame.shape[0]:
+        return None
+    return SlotLayout(estimate.left, regionTop + top, estimate.width,
+                      height, round(pitch), estimate.count, "calibrated")
+
+
+def getSlotRegion():
+    """覆盖全部栏位的截图区域 (左, 上, 宽, 高)"""
+    layout = getSlotLayout()
+    return layout.left, layout.top, layout.width, (layout.count - 1) * layout.pitch + layout.height
+
+
+# ===================== 截图后端 =====================
+# 截图通过统一的后端接口完成：X11 共享内存（复用缓冲区，Linux）、pyautogui（原有方式）、
+# 从录制的整屏PNG回放的文件后端（无需桌面，可离线运行和基准测试整个F12流程）
+
+class CaptureBackend:
+    """截图后端基类：grab(region) 返回 (高, 宽, 3) 的 RGB uint8 数组，region 为 (左, 上, 宽, 高)"""
+
+    name = "base"
+    interactive = True  # 是否截取真实屏幕（需要按住Ctrl展开战备菜单并固定鼠标）
+
+    def grab(self, region):
+        raise NotImplementedError
+
+    def close(self):
+        pass
 
-        # 获取屏幕分辨率一次
-        screenWidth = basicConfig.get("screen_width", 2560)
-        screenHeight = basicConfig.get("screen_height", 1440)
 
-        # 预计算坐标
-        startX = round(screenWidth * 0.05859)
-        startY = round(screenHeight * 0.075)
+class PyautoguiCapture(CaptureBackend):
+    """pyautogui.screenshot，每次截图都生成新的PIL图像"""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        requirePyautogui("截图")
+
+    def grab(self, region):
+        return np.asarray(pyautogui.screenshot(region=region))
+
+
+class XImage(ctypes.Structure):
+    """Xlib 的 XImage 结构体（只用到前面的字段，后面的函数指针表不需要）"""
+
+    _fields_ = [("width", ctypes.c_int), ("height", ctypes.c_int), ("xoffset", ctypes.c_int),
+                ("format", ctypes.c_int), ("data", ctypes.c_void_p), ("byte_order", ctypes.c_int),
+                ("bitmap_unit", ctypes.c_int), ("bitmap_bit_order", ctypes.c_int), ("bitmap_pad", ctypes.c_int),
+                ("depth", ctypes.c_int), ("bytes_per_line", ctypes.c_int), ("bits_per_pixel", ctypes.c_int)]
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [("shmseg", ctypes.c_ulong), ("shmid", ctypes.c_int),
+                ("shmaddr", ctypes.c_void_p), ("readOnly", ctypes.c_int)]
+
+
+class XShmCapture(CaptureBackend):
+    """通过 MIT-SHM 扩展把屏幕区域直接拷贝到共享内存，每种区域尺寸只创建一次 XImage 和共享内存段并反复复用"""
+
+    name = "xshm"
+    ZPixmap, IPC_PRIVATE, IPC_CREAT, IPC_RMID = 2, 0, 0o1000, 0
+    AllPlanes = ctypes.c_ulong(-1).value
+
+    def __init__(self):
+        importHeavyModules()
+        x11Path, xextPath = ctypes.util.find_library("X11"), ctypes.util.find_library("Xext")
+        if not x11Path or not xextPath:
+            raise RuntimeError("未找到 libX11 / libXext")
+        self.x11, self.xext = ctypes.CDLL(x11Path), ctypes.CDLL(xextPath)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        x11, xext, libc = self.x11, self.xext, self.libc
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        for function in (x11.XDefaultScreen, x11.XDefaultDepth, x11.XDefaultVisual, x11.XRootWindow):
+            function.argtypes = [ctypes.c_void_p] + ([ctypes.c_int] if function is not x11.XDefaultScreen else [])
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XFree.argtypes = [ctypes.c_void_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_char_p, ctypes.POINTER(XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint]
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+        self.display = x11.XOpenDisplay(None)
+        if not self.display:
+            raise RuntimeError("无法连接X11显示（DISPLAY未设置？）")
+        if not xext.XShmQueryExtension(self.display):
+            x11.XCloseDisplay(self.display)
+            raise RuntimeError("X服务器不支持MIT-SHM扩展")
+        screen = x11.XDefaultScreen(self.display)
+        self.visual = x11.XDefaultVisual(self.display, screen)
+        self.depth = x11.XDefaultDepth(self.display, screen)
+        self.root = x11.XRootWindow(self.display, screen)
+        self.buffers = {}  # (宽, 高) -> (XImage指针, XShmSegmentInfo, BGRX视图)
+        self.lock = threading.Lock()  # Xlib连接不是线程安全的
+        # 预先创建栏位区域的缓冲区：共享内存不可用时在这里失败，getCaptureBackend 才能退回 pyautogui
+        try:
+            self.getBuffer(*getSlotRegion()[2:])
+        except Exception:
+            self.close()
+            raise
+
+    def getBuffer(self, width, height):
+        buffer = self.buffers.get((width, height))
+        if buffer is not None:
+            return buffer
+        shmInfo = XShmSegmentInfo()
+        image = self.xext.XShmCreateImage(self.display, self.visual, self.depth, self.ZPixmap,
+                                          None, ctypes.byref(shmInfo), width, height)
+        if not image:
+            raise RuntimeError("XShmCreateImage 失败")
+        contents = image.contents
+        if contents.bits_per_pixel != 32:
+            self.x11.XFree(image)
+            raise RuntimeError(f"不支持 {contents.bits_per_pixel} 位像素格式")
+        size = contents.bytes_per_line * height
+        shmInfo.shmid = self.libc.shmget(self.IPC_PRIVATE, size, self.IPC_CREAT | 0o600)
+        if shmInfo.shmid < 0:
+            self.x11.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmget 失败")
+        shmInfo.shmaddr = self.libc.shmat(shmInfo.shmid, None, 0)
+        if shmInfo.shmaddr is None or shmInfo.shmaddr == ctypes.c_void_p(-1).value:
+            # shmat 失败时返回 (void*)-1，不能当作缓冲区地址使用
+            errno = ctypes.get_errno()
+            self.libc.shmctl(shmInfo.shmid, self.IPC_RMID, None)
+            self.x11.XFree(image)
+            raise OSError(errno, "shmat 失败")
+        contents.data = shmInfo.shmaddr
+        shmInfo.readOnly = 0
+        self.xext.XShmAttach(self.display, ctypes.byref(shmInfo))
+        self.x11.XSync(self.display, 0)
+        # X服务器已经映射该段，标记删除后进程退出时会自动回收
+        self.libc.shmctl(shmInfo.shmid, self.IPC_RMID, None)
+        raw = (ctypes.c_ubyte * size).from_address(shmInfo.shmaddr)
+        view = np.frombuffer(raw, dtype=np.uint8).reshape(height, contents.bytes_per_line // 4, 4)[:, :width]
+        buffer = (image, shmInfo, view)
+        self.buffers[(width, height)] = buffer
+        return buffer
+
+    def grab(self, region):
+        left, top, width, height = region
+        with self.lock:
+            image, _, view = self.getBuffer(width, height)
+            if not self.xext.XShmGetImage(self.display, self.root, image, left, top, self.AllPlanes):
+                raise RuntimeError("XShmGetImage 失败")
+            # 共享内存中是 BGRX，转换成 RGB 时复制一份，下次截图覆盖缓冲区不影响已返回的画面
+            return view[:, :, 2::-1].copy()
+
+    def close(self):
+        with self.lock:
+            for image, shmInfo, _ in self.buffers.values():
+                self.xext.XShmDetach(self.display, ctypes.byref(shmInfo))
+                self.x11.XFree(image)
+                self.libc.shmdt(shmInfo.shmaddr)
+            self.buffers.clear()
+            if self.display:
+                self.x11.XCloseDisplay(self.display)
+                self.display = None
+
+
+class FileCapture(CaptureBackend):
+    """假屏幕：按文件名顺序循环回放目录中录制的整屏PNG，每次截图前进一帧"""
+
+    name = "file"
+    interactive = False
+
+    def __init__(self, directory=None):
+        importHeavyModules()
+        if directory is None:
+            directory = os.path.join(os.path.dirname(configDir), basicConfig.get("capture_file_dir", "Config/FakeScreen"))
+        paths = sorted(os.path.join(directory, fileName) for fileName in os.listdir(directory)
+                       if fileName.lower().endswith(".png"))
+        if not paths:
+            raise RuntimeError(f"{directory} 中没有PNG截图")
+        self.frames = []
+        for path in paths:
+            with Image.open(path) as image:
+                self.frames.append(np.asarray(image.convert("RGB")))
+        self.position = 0
+        self.lock = threading.Lock()
+
+    def grab(self, region):
+        left, top, width, height = region
+        with self.lock:
+            frame = self.frames[self.position]
+            self.position = (self.position + 1) % len(self.frames)
+        return frame[top:top + height, left:left + width]
+
+
+captureBackendClasses = {backend.name: backend for backend in (XShmCapture, PyautoguiCapture, FileCapture)}
+captureBackend = None
+captureBackendLock = threading.Lock()
+captureTimers = {}  # 后端名称 -> ListenerTimer，记录每次截图的耗时
+
+
+def createCaptureBackend(name):
+    """按名称创建截图后端；auto 在 Linux X11 下优先使用共享内存，创建失败时退回 pyautogui"""
+    if name == "auto":
+        name = "xshm" if sys.platform.startswith("linux") and os.environ.get("DISPLAY") else "pyautogui"
+    backendClass = captureBackendClasses.get(name)
+    if backendClass is None:
+        screenshotLogger.warning(f"未知的截图后端 {name}，使用 pyautogui")
+        backendClass = PyautoguiCapture
+    try:
+        return backendClass()
+    except Exception as e:
+        if backendClass is PyautoguiCapture:
+            raise
+        screenshotLogger.error(f"创建截图后端 {name} 失败，使用 pyautogui: {e}")
+        return PyautoguiCapture()
+
+
+def getCaptureBackend():
+    """返回常驻的截图后端，第一次调用时按配置创建"""
+    global captureBackend
+    with captureBackendLock:
+        if captureBackend is None:
+            captureBackend = createCaptureBackend(basicConfig.get("capture_backend", "auto"))
+            screenshotLogger.info(f"截图后端：{captureBackend.name}")
+        return captureBackend
+
+
+def closeCaptureBackend():
+    global captureBackend
+    with captureBackendLock:
+        if captureBackend is not None:
+            captureBackend.close()
+            captureBackend = None
+
+
+def timedGrab(backend, region):
+    """截图并把耗时记入该后端的统计"""
+    startTime = time.perf_counter()
+    frame = backend.grab(region)
+    elapsed = time.perf_counter() - startTime
+    timer = captureTimers.get(backend.name)
+    if timer is None:
+        timer = captureTimers.setdefault(backend.name, ListenerTimer())
+    timer.record(elapsed)
+    return frame, elapsed
+
+
+def runCaptureBenchmark(iterations=100):
+    """截图基准：依次创建各截图后端，截取栏位区域并统计耗时"""
+    region = getSlotRegion()
+    print(f"截图基准（区域 {region}，每个后端 {iterations} 次，单位ms）")
+    for name, backendClass in captureBackendClasses.items():
+        try:
+            backend = backendClass()
+        except Exception as e:
+            print(f"  {name:<10} 不可用：{e}")
+            continue
+        try:
+            for _ in range(iterations):
+                timedGrab(backend, region)
+        finally:
+            backend.close()
+        stats = captureTimers[name].getStats()
+        print(f"  {name:<10} 平均 {stats['average'] * 1000:7.2f}  p99 {stats['p99'] * 1000:7.2f}  "
+              f"最长 {stats['max'] * 1000:7.2f}")
 
-        # 一次性处理所有截图
-        for i in range(8):
-            try:
-                # 计算当前截图区域
-                region = (startX, startY + i * 70, 290, 30)
 
-                # 截图并保存到内存列表中
-                screenshot = pyautogui.screenshot(region=region)
-                screenshots.append(screenshot)
-                screenshotLogger.debug(f"已截取图片到内存 screenshot{i+1}.png")
+def captureScreenshotsToMemory(holdCtrl=True):
+    """一次截取覆盖全部栏位的矩形区域，再在内存中按栏位切片（NumPy视图，不复制像素）
 
-                # 强制垃圾回收
-                if i % 3 == 0:  # 每3次截图执行一次垃圾回收
-                    gc.collect()
-            except Exception as e:
-                screenshotLogger.error(f"截图 {i+1} 失败: {e}")
-                # 即使单个截图失败，也要继续下一个
-                continue
+    所有栏位来自同一帧画面，按住Ctrl的时间也缩短为一次截图的耗时。
+    holdCtrl 为False时（菜单监视自动触发，玩家正按住Ctrl）不模拟Ctrl。
+    """
+    screenshotLogger.info("开始截图流程")
+    screenshots = []  # 用于存储内存中的截图
+    backend = getCaptureBackend()
+    layout = getSlotLayout()
+    # 新分辨率首次识别时截取更大的区域用于校准
+    calibrate = layout.source == "scaled" and basicConfig.get("layout_auto_calibrate", True)
+    if calibrate:
+        region = getCalibrationRegion(layout)
+    else:
+        region = (layout.left, layout.top, layout.width, (layout.count - 1) * layout.pitch + layout.height)
+    holdCtrl = holdCtrl and backend.interactive
+    if holdCtrl:
+        requirePyautogui("模拟Ctrl键")
+    holdStart = time.perf_counter()
+    try:
+        # 按住Ctrl键（回放录制画面时不需要）
+        if holdCtrl:
+            pyautogui.keyDown('ctrl')
+            time.sleep(0.1)  # 减少延迟
 
+        # 一次截取包含所有栏位的区域
+        frame, grabTime = timedGrab(backend, region)
     except Exception as e:
         screenshotLogger.error(f"截图过程中发生错误: {e}")
-        # 确保Ctrl键被释放，即使在异常情况下
-        try:
-            pyautogui.keyUp('ctrl')
-        except:
-            pass
         raise
     finally:
-        # 确保Ctrl键被释放
+        # 确保Ctrl键被释放，即使在异常情况下
+        if holdCtrl:
+            try:
+                pyautogui.keyUp('ctrl')
+            except Exception as e:
+                screenshotLogger.warning(f"释放Ctrl键时出错: {e}")
+    holdTime = time.perf_counter() - holdStart
+
+    if calibrate:
+        calibrated = calibrateLayout(frame, region[1], layout)
+        resolution = f"{basicConfig.get('screen_width', 2560)}x{basicConfig.get('screen_height', 1440)}"
+        if calibrated is not None:
+            layout = calibrated
+            saveLayoutProfile(resolution, layout)
+            screenshotLogger.info(f"已校准 {resolution} 的栏位布局: {layout}")
+        else:
+            screenshotLogger.warning(f"未能在截图中找到战备栏位文字行，{resolution} 暂时使用等比缩放的布局: {layout}")
+        # 只保留栏位区域，与不校准时截取的画面一致
+        offset = layout.top - region[1]
+        frame = frame[offset:offset + (layout.count - 1) * layout.pitch + layout.height]
+
+    # 按栏位切片，每个切片都是frame的视图
+    for i in range(layout.count):
+        top = i * layout.pitch
+        slot = frame[top:top + layout.height]
+        if slot.shape[0] != layout.height:
+            # 区域超出截取的画面（布局与屏幕不符）时，不把被截短的切片当作栏位识别
+            screenshotLogger.warning(f"栏位 {i + 1} 超出截图范围（{slot.shape[0]}/{layout.height} 行），"
+                                     f"忽略该栏位及之后的栏位")
+            break
+        screenshots.append(slot)
+        screenshotLogger.debug(f"已截取图片到内存 screenshot{i+1}.png")
+
+    grabStats = captureTimers[backend.name].getStats()
+    screenshotLogger.info(f"截图完成，已将{len(screenshots)}张截图保存在内存中"
+                          f"（{backend.name} 截图耗时 {grabTime * 1000:.1f} ms，累计 {grabStats['count']} 次平均 "
+                          f"{grabStats['average'] * 1000:.1f} ms，按住Ctrl共 {holdTime * 1000:.1f} ms）")
+    print(f"已将{len(screenshots)}张截图保存在内存中。")
+    if menuWatcher is not None:
+        menuWatcher.setCandidate(frame)
+    return screenshots
+
+# ===================== 战备菜单监视 =====================
+# 可选：按固定频率截取战备列表左侧的一小条区域并降采样，与上次识别成功时记录的签名比较：
+# 行亮度分布（文字行与间隔的明暗交替）相关度高说明战备菜单已打开，缩略图与上次识别时明显不同说明配装已变化，
+# 连续多次满足时自动触发识别流程，相当于替玩家按下F12
+
+menuSignaturePath = os.path.join(configDir, "menu_signature.json")
+
+
+class MenuWatcher:
+    """战备菜单监视线程，签名来自上次识别成功时的截图并保存在 Config/menu_signature.json"""
+
+    watchFraction = 3        # 只截取每个栏位最左侧的 1/3（战备名称开头）
+    sampleStep = 4           # 降采样步长
+    visibleThreshold = 0.7   # 行亮度分布与签名的相关系数达到该值视为菜单已打开
+    changeThreshold = 6.0    # 缩略图平均灰度差超过该值视为配装已变化
+    confirmSamples = 2       # 连续满足条件的采样次数（去抖）
+    cooldownSeconds = 5.0    # 自动触发后的冷却时间
+
+    def __init__(self, interval=0.25):
+        self.interval = max(0.05, float(interval))
+        self.stopEvent = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.signature = None   # (行亮度分布, 缩略图)
+        self.candidate = None   # 本次识别截取的画面，识别成功后才成为签名
+        self.timer = ListenerTimer()
+        self.cpuSeconds = 0.0
+        self.startTime = None
+        self.triggers = 0
+
+    def start(self):
+        self.startTime = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopEvent.set()
+
+    def getRegion(self):
+        left, top, width, height = getSlotRegion()
+        return left, top, max(1, width // self.watchFraction), height
+
+    def features(self, frame):
+        """返回 (归一化的行亮度分布, 降采样灰度缩略图)"""
+        thumbnail = frame[::self.sampleStep, ::self.sampleStep].mean(axis=2, dtype=np.float32)
+        profile = thumbnail.mean(axis=1)
+        profile -= profile.mean()
+        norm = float(np.linalg.norm(profile))
+        return (profile / norm if norm > 1e-6 else profile), thumbnail
+
+    def setCandidate(self, frame):
+        """记录本次识别截取的栏位区域（只保留监视的部分）"""
+        with self.lock:
+            self.candidate = frame[:, :self.getRegion()[2]]
+
+    def acceptCandidate(self):
+        """识别成功：用本次截图更新签名并保存"""
+        with self.lock:
+            frame, self.candidate = self.candidate, None
+            if frame is None:
+                return
+            self.signature = self.features(frame)
+        self.saveSignature()
+
+    def loadSignature(self):
         try:
-            pyautogui.keyUp('ctrl')
+            with open(menuSignaturePath, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
         except Exception as e:
-            screenshotLogger.warning(f"释放Ctrl键时出错: {e}")
+            mainLogger.warning(f"读取战备菜单签名失败: {e}")
+            return
+        if stored.get("region") != list(self.getRegion()):
+            mainLogger.info("分辨率已变化，战备菜单签名失效，识别成功后重新记录")
+            return
+        self.signature = (np.asarray(stored["profile"], dtype=np.float32),
+                          np.asarray(stored["thumbnail"], dtype=np.float32))
 
-    screenshotLogger.info("截图完成，已将8张截图保存在内存中")
-    print(f"已将8张截图保存在内存中。")
-    return screenshots
+    def saveSignature(self):
+        profile, thumbnail = self.signature
+        stored = {"region": list(self.getRegion()), "profile": [round(float(value), 5) for value in profile],
+                  "thumbnail": np.round(thumbnail, 1).tolist()}
+        try:
+            tempPath = menuSignaturePath + ".tmp"
+            with open(tempPath, 'w', encoding='utf-8') as f:
+                json.dump(stored, f)
+            os.replace(tempPath, menuSignaturePath)
+        except Exception as e:
+            mainLogger.warning(f"保存战备菜单签名失败: {e}")
+
+    def classify(self, frame):
+        """返回 (菜单是否打开, 配装是否与签名不同)"""
+        signatureProfile, signatureThumbnail = self.signature
+        profile, thumbnail = self.features(frame)
+        if profile.shape != signatureProfile.shape:
+            return False, False
+        visible = float(profile @ signatureProfile) >= self.visibleThreshold
+        changed = visible and float(np.abs(thumbnail - signatureThumbnail).mean()) > self.changeThreshold
+        return visible, changed
+
+    def _run(self):
+        try:
+            importHeavyModules()
+            self.loadSignature()
+            backend = getCaptureBackend()
+        except Exception as e:
+            # 截图后端无法创建（没有桌面、XShm和pyautogui都不可用等）时停止监视，F12仍可手动识别
+            mainLogger.error(f"战备菜单监视启动失败，停止自动识别: {e}")
+            self.stopEvent.set()
+            return
+        streak = 0
+        lastTrigger = 0.0
+        while not self.stopEvent.wait(self.interval):
+            # 还没有签名（从未识别成功）或正在识别时不采样
+            if self.signature is None or globalState["screenshotTriggered"]:
+                streak = 0
+                continue
+            cpuStart = time.thread_time()
+            sampleStart = time.perf_counter()
+            try:
+                with self.lock:
+                    _, changed = self.classify(backend.grab(self.getRegion()))
+            except Exception as e:
+                mainLogger.error(f"战备菜单采样失败: {e}")
+                self.stopEvent.wait(5.0)
+                continue
+            self.timer.record(time.perf_counter() - sampleStart)
+            self.cpuSeconds += time.thread_time() - cpuStart
+            streak = streak + 1 if changed else 0
+            if streak >= self.confirmSamples and sampleStart - lastTrigger >= self.cooldownSeconds:
+                streak = 0
+                lastTrigger = sampleStart
+                mainLogger.info("检测到战备菜单打开且配装已变化，自动开始识别")
+                if startRecognition(autoTriggered=True):
+                    self.triggers += 1
+
+    def getStats(self):
+        stats = self.timer.getStats()
+        elapsed = time.perf_counter() - self.startTime if self.startTime else 0.0
+        stats["cpuPercent"] = self.cpuSeconds / elapsed * 100 if elapsed else 0.0
+        stats["triggers"] = self.triggers
+        return stats
+
+
+menuWatcher = None
+
+
+def startMenuWatcher():
+    """按配置启动战备菜单监视线程"""
+    global menuWatcher
+    if not basicConfig.get("menu_watch", False) or menuWatcher is not None:
+        return menuWatcher
+    menuWatcher = MenuWatcher(basicConfig.get("menu_watch_interval", 0.25)).start()
+    return menuWatcher
+
+
+def stopMenuWatcher():
+    """停止战备菜单监视并输出每次采样的开销"""
+    if menuWatcher is None:
+        return
+    menuWatcher.stop()
+    stats = menuWatcher.getStats()
+    mainLogger.info(f"战备菜单监视：采样 {stats['count']} 次，平均 {stats['average'] * 1000:.2f} ms，"
+                    f"p99 {stats['p99'] * 1000:.2f} ms，CPU占用 {stats['cpuPercent']:.2f}% 单核，"
+                    f"自动识别 {stats['triggers']} 次")
+
+
+# ===================== 并行OCR进程池 =====================
+# 进程池在程序启动时预先创建，F12时直接分发任务，避免每次识别都重新启动进程
+ocrProcessPool = None
+ocrProcessPoolLock = threading.Lock()
+
+
+def getOcrWorkerCount():
+    """计算OCR进程数：优先使用配置 ocr_workers，为0时按CPU核心数自动确定（保留一个核心给主程序）"""
+    try:
+        configuredWorkers = int(basicConfig.get("ocr_workers", 0) or 0)
+    except (TypeError, ValueError):
+        configuredWorkers = 0
+    if configuredWorkers > 0:
+        return configuredWorkers
+    cpuCount = os.cpu_count() or 1
+    # 截图最多8张，超过8个进程没有意义
+    return max(1, min(8, cpuCount - 1))
+
+
+def _ocrWorkerWarmup():
+    """进程池预热任务：促使子进程启动，并在子进程中加载和预热OCR引擎"""
+    importOcrModules()
+    warmUpOcrEngine()
+    return os.getpid()
+
+
+def _ocrWorkerTask(image, imageName, assetsData, psmOrder, preprocessed, deferMatch=False):
+    """在子进程中识别单张截图，返回 (截图名称, 识别结果, PSM信息, 耗时秒数)"""
+    startTime = time.perf_counter()
+    importOcrModules()
+    slotResults = {}
+    ocrInfo = processImageFromMemory(image, imageName, assetsData, slotResults, psmOrder, preprocessed, deferMatch)
+    return imageName, slotResults.get(imageName, {"": ""}), ocrInfo, time.perf_counter() - startTime
+
+
+def startOcrProcessPool():
+    """创建并预热OCR进程池，重复调用时返回已有的进程池"""
+    global ocrProcessPool
+    with ocrProcessPoolLock:
+        if ocrProcessPool is not None:
+            return ocrProcessPool
+        workerCount = getOcrWorkerCount()
+        try:
+            # 各平台统一使用spawn：Linux默认的fork会把GUI进程的线程、锁和Tk状态复制进子进程
+            pool = ProcessPoolExecutor(max_workers=workerCount, mp_context=multiprocessing.get_context("spawn"))
+            # 每个进程提交一个空任务，让所有子进程立即启动，而不是等到第一次F12
+            for _ in range(workerCount):
+                pool.submit(_ocrWorkerWarmup)
+        except Exception as e:
+            ocrLogger.error(f"创建OCR进程池失败，将使用顺序识别: {e}")
+            return None
+        ocrProcessPool = pool
+        ocrLogger.info(f"OCR进程池已启动，进程数：{workerCount}")
+        return pool
+
+
+def shutdownOcrProcessPool():
+    """关闭OCR进程池，不等待未完成的任务"""
+    global ocrProcessPool
+    with ocrProcessPoolLock:
+        if ocrProcessPool is None:
+            return
+        try:
+            ocrProcessPool.shutdown(wait=False, cancel_futures=True)
+        except Exception as e:
+            ocrLogger.warning(f"关闭OCR进程池时出错: {e}")
+        ocrProcessPool = None
+
+
+# ===================== 栏位变化检测 =====================
+# 同一局游戏中重复按F12时，大部分栏位的截图不会变化；
+# 对每张截图计算缩略图指纹，与上一次识别时的指纹对比，未变化的栏位直接复用上次的识别结果。
+class SlotChangeDetector:
+    """保存每个栏位上一次的缩略图指纹和识别结果，统计命中/未命中次数"""
+
+    thumbnailSize = (72, 8)  # 290x30的截图缩小到约1/4，足以区分不同的战备名称
+
+    def __init__(self):
+        self.previous = {}  # 截图名称 -> (指纹, 识别结果)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def fingerprint(self, image):
+        """缩略灰度图作为指纹，缩放时的平均化能吸收少量噪点"""
+        return Image.fromarray(toGrayArray(image)).resize(self.thumbnailSize, Image.BOX)
+
+    def isSame(self, fingerprintA, fingerprintB):
+        if fingerprintA.size != fingerprintB.size:
+            return False
+        threshold = basicConfig.get("slot_change_threshold", 3.0)
+        meanDifference = sum(ImageStat.Stat(ImageChops.difference(fingerprintA, fingerprintB)).mean)
+        return meanDifference <= threshold
+
+    def lookup(self, imageName, fingerprint):
+        """返回该栏位上次的识别结果（截图未变化时），否则返回None"""
+        with self.lock:
+            previous = self.previous.get(imageName)
+            if previous is not None and self.isSame(previous[0], fingerprint):
+                self.hits += 1
+                return previous[1]
+            self.misses += 1
+            return None
+
+    def store(self, imageName, fingerprint, result):
+        with self.lock:
+            self.previous[imageName] = (fingerprint, result)
+
+    def reset(self):
+        """清空所有指纹（例如战备库或识别语言变化后）"""
+        with self.lock:
+            self.previous.clear()
+
+    def getStats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hitRate": self.hits / total if total else 0.0}
+
+
+slotChangeDetector = SlotChangeDetector()
+
+
+def runOcrInProcessPool(slots, assetsData, preprocessed=False, recognizedTexts=None, onSlotResolved=None):
+    """将每个栏位 (截图名称, 截图) 分发到进程池并行识别，失败时返回None由调用方顺序处理
+
+    传入 recognizedTexts 字典时只识别不匹配，各栏位的识别文本写入该字典，由调用方统一匹配。
+    onSlotResolved(截图名称, 结果) 在每个栏位完成时按完成顺序调用。
+    """
+    pool = startOcrProcessPool()
+    if pool is None:
+        return None
+    ocrLang = basicConfig.get("ocr_language", "chi_sim")
+    try:
+        # PSM调度器只存在于主进程，提交任务时把尝试顺序一并传给子进程
+        futures = [
+            pool.submit(_ocrWorkerTask, screenshot, imageName, assetsData,
+                        psmScheduler.orderFor(imageName, ocrLang), preprocessed, recognizedTexts is not None)
+            for imageName, screenshot in slots
+        ]
+        slotResults = {}
+        for future in as_completed(futures):
+            imageName, result, ocrInfo, elapsed = future.result()
+            slotResults[imageName] = result
+            if recognizedTexts is not None:
+                recognizedTexts[imageName] = ocrInfo["text"]
+            psmScheduler.record(imageName, ocrLang, ocrInfo["psm"], ocrInfo["passes"], ocrInfo["earlyExit"])
+            ocrLogger.info(f"图片 {imageName} 识别耗时: {elapsed * 1000:.1f} ms")
+            if onSlotResolved is not None:
+                onSlotResolved(imageName, result if recognizedTexts is None
+                               else provisionalSlotResult(ocrInfo["text"], assetsData))
+    except Exception as e:
+        ocrLogger.error(f"并行OCR识别失败，改为顺序识别: {e}")
+        shutdownOcrProcessPool()
+        return None
+    return slotResults
+
+
+def runOcrBatch(slots, assetsData, preprocessed=False, recognizedTexts=None, onSlotResolved=None):
+    """批量识别：每一轮按各栏位的PSM顺序分组，每组只启动一次tesseract；提前结束的栏位不再参加后续轮次
+
+    传入 recognizedTexts 字典时只识别不匹配，各栏位的识别文本写入该字典，由调用方统一匹配。
+    onSlotResolved(截图名称, 结果) 在栏位提前结束时立即调用，其余栏位在最后一轮之后调用。
+    """
+    engine = getOcrEngine()
+    ocrLang = basicConfig.get("ocr_language", "chi_sim")
+    images = {imageName: image if preprocessed else np.asarray(preprocessImageFromMemory(image))
+              for imageName, image in slots}
+    states = {
+        imageName: {"order": psmScheduler.orderFor(imageName, ocrLang), "best": "", "match": None,
+                    "info": {"psm": None, "passes": 0, "earlyExit": False}}
+        for imageName, _ in slots
+    }
+    for roundIndex in range(len(defaultPsmOrder)):
+        # 本轮仍需识别的栏位，按各自的第roundIndex个PSM分组
+        groups = {}
+        for imageName, state in states.items():
+            if not state["info"]["earlyExit"] and roundIndex < len(state["order"]):
+                groups.setdefault(state["order"][roundIndex], []).append(imageName)
+        for psm, imageNames in groups.items():
+            batchStart = time.perf_counter()
+            try:
+                pages = engine.imageToDataBatch([images[imageName] for imageName in imageNames], psm)
+            except Exception as e:
+                ocrLogger.warning(f"批量OCR --psm {psm} 失败: {e}")
+                pages = [None] * len(imageNames)
+            ocrLogger.info(f"批量OCR --psm {psm}：{len(imageNames)} 张截图耗时 {(time.perf_counter() - batchStart) * 1000:.1f} ms")
+            for imageName, data in zip(imageNames, pages):
+                state = states[imageName]
+                state["info"]["passes"] += 1
+                if data is None:
+                    continue
+                currentResult, passMatch = evaluateOcrPass(data, assetsData)
+                if len(currentResult) > len(state["best"]) or passMatch:
+                    state["best"] = currentResult
+                    state["info"]["psm"] = psm
+                if passMatch:
+                    state["info"]["earlyExit"] = True
+                    state["match"] = passMatch
+                    if onSlotResolved is not None:
+                        onSlotResolved(imageName, {passMatch[0]: assetsData.get(passMatch[0], "")})
+
+    slotResults = {}
+    for imageName, state in states.items():
+        try:
+            bestResult = state["best"] or engine.imageToString(images[imageName])
+            if recognizedTexts is not None:
+                recognizedTexts[imageName] = cleanRecognizedText(bestResult)
+            else:
+                matchRecognizedText(imageName, cleanRecognizedText(bestResult), assetsData, slotResults, state["match"])
+        except Exception as e:
+            ocrLogger.error(f"处理图片 {imageName} 失败：{str(e)}")
+            slotResults[imageName] = {"": ""}
+        info = state["info"]
+        psmScheduler.record(imageName, ocrLang, info["psm"], info["passes"], info["earlyExit"])
+        if onSlotResolved is not None and not info["earlyExit"]:
+            result = slotResults.get(imageName)
+            if result is None:
+                result = provisionalSlotResult((recognizedTexts or {}).get(imageName, ""), assetsData)
+            onSlotResolved(imageName, result)
+    return slotResults
+
+
+blankVarianceThreshold = 20.0  # 原始截图灰度方差低于该值（标准差约4.5）视为没有文字
+blankInkRatio = 0.003          # 二值化后白色（文字）像素比例低于该值视为没有文字
+
+
+def isBlankSlot(screenshot, binary=None):
+    """空栏位判断：原始截图灰度几乎没有起伏，或二值化后几乎没有文字像素
+
+    binary 为批量预处理的结果；没有时按固定阈值对灰度图二值化近似判断。
+    """
+    gray = toGrayArray(screenshot)
+    if float(gray.var()) < blankVarianceThreshold:
+        return True
+    inkPixels = np.count_nonzero(binary) if binary is not None else np.count_nonzero(gray > fixedThreshold)
+    return inkPixels < blankInkRatio * gray.size
 
-def runOcrRecognition(screenshots):
-    """执行OCR识别流程，接收内存中的截图列表"""
+
+def runOcrRecognition(screenshots, onSlotResolved=None):
+    """执行OCR识别流程，接收内存中的截图列表
+
+    onSlotResolved(截图名称, 结果) 在每个栏位有了结果时立即调用（复用和空栏位最先），用于增量绑定；
+    启用一对一匹配时回调中是单栏位的临时匹配，最终结果以返回值为准。
+    """
     ocrLogger.info("开始OCR识别流程")
     # 步骤1：加载JSON中【左侧的中文文本】
     assetsData = loadAssetsText()
@@ -487,13 +2910,113 @@ def runOcrRecognition(screenshots):
         print("程序退出：无有效对比文本")
         return
 
-    # 有序字典存储识别结果
-    localTesseractResults = {}
+    recognitionStart = time.perf_counter()
+    ocrLang = basicConfig.get("ocr_language", "chi_sim")
+    slots = [(f"screenshot{i+1}.png", screenshot) for i, screenshot in enumerate(screenshots)]
+
+    # 步骤2：栏位变化检测，截图未变化的栏位直接复用上次的识别结果
+    reusedResults = {}
+    fingerprints = {}
+    pendingSlots = slots
+    if basicConfig.get("slot_change_detection", True):
+        pendingSlots = []
+        for imageName, screenshot in slots:
+            fingerprints[imageName] = slotChangeDetector.fingerprint(screenshot)
+            previousResult = slotChangeDetector.lookup(imageName, fingerprints[imageName])
+            if previousResult is not None:
+                reusedResults[imageName] = previousResult
+            else:
+                pendingSlots.append((imageName, screenshot))
+        if onSlotResolved is not None:
+            for imageName, result in reusedResults.items():
+                onSlotResolved(imageName, result)
+        changeStats = slotChangeDetector.getStats()
+        ocrLogger.info(f"栏位变化检测：本次复用 {len(reusedResults)} 个，需要识别 {len(pendingSlots)} 个"
+                       f"（累计命中率 {changeStats['hitRate']:.0%}，命中 {changeStats['hits']} / 未命中 {changeStats['misses']}）")
+
+    # 步骤3：批量预处理需要识别的栏位，之后只传递二值化结果的视图
+    preprocessed = False
+    binaryBatch = None
+    rawScreenshots = dict(pendingSlots)
+    if pendingSlots and basicConfig.get("preprocess_batch", True):
+        try:
+            preprocessStart = time.perf_counter()
+            binaryBatch, binaryViews = preprocessBatch([screenshot for _, screenshot in pendingSlots])
+            pendingSlots = [(imageName, view) for (imageName, _), view in zip(pendingSlots, binaryViews)]
+            preprocessed = True
+            ocrLogger.info(f"批量预处理 {len(pendingSlots)} 张截图耗时: {(time.perf_counter() - preprocessStart) * 1000:.1f} ms")
+        except Exception as e:
+            ocrLogger.warning(f"批量预处理失败，改为逐张预处理: {e}")
+
+    # 空栏位（配装不满8个战备）不送入OCR，直接记为空结果
+    blankNames = []
+    if pendingSlots and basicConfig.get("blank_slot_detection", True):
+        blankNames = [imageName for imageName, screenshot in pendingSlots
+                      if isBlankSlot(rawScreenshots[imageName], screenshot if preprocessed else None)]
+        if blankNames:
+            pendingSlots = [(imageName, screenshot) for imageName, screenshot in pendingSlots if imageName not in blankNames]
+            psmScheduler.recordBlank(len(blankNames))
+            ocrLogger.info(f"空栏位检测：{', '.join(blankNames)} 没有文字，跳过OCR")
+            if onSlotResolved is not None:
+                for imageName in blankNames:
+                    onSlotResolved(imageName, {"": ""})
+    rawScreenshots = None
+
+    # 步骤4：识别发生变化的栏位；启用一对一匹配时各栏位只识别文本，匹配留到步骤5统一进行
+    oneToOne = basicConfig.get("match_one_to_one", True)
+    recognizedTexts = {} if oneToOne else None
+    recognizedResults = None
+    if pendingSlots and isBatchOcrEngine():
+        # 批量模式：每个PSM只启动一次tesseract处理所有栏位
+        recognizedResults = runOcrBatch(pendingSlots, assetsData, preprocessed, recognizedTexts, onSlotResolved)
+    elif basicConfig.get("ocr_parallel", True) and len(pendingSlots) > 1:
+        # 并行模式：截图分发到预先启动的进程池
+        recognizedResults = runOcrInProcessPool(pendingSlots, assetsData, preprocessed, recognizedTexts, onSlotResolved)
+
+    if recognizedResults is None:
+        recognizedResults = {}
+        recognizedTexts = {} if oneToOne else None
+
+        # 顺序处理内存中的截图，避免同时处理过多图片占用内存
+        for imageName, screenshot in pendingSlots:
+            slotStart = time.perf_counter()
+            ocrInfo = processImageFromMemory(screenshot, imageName, assetsData, recognizedResults,
+                                             preprocessed=preprocessed, deferMatch=oneToOne)
+            if oneToOne:
+                recognizedTexts[imageName] = ocrInfo["text"]
+            psmScheduler.record(imageName, ocrLang, ocrInfo["psm"], ocrInfo["passes"], ocrInfo["earlyExit"])
+            ocrLogger.info(f"图片 {imageName} 识别耗时: {(time.perf_counter() - slotStart) * 1000:.1f} ms")
+            if onSlotResolved is not None:
+                onSlotResolved(imageName, provisionalSlotResult(ocrInfo["text"], assetsData) if oneToOne
+                               else recognizedResults.get(imageName, {"": ""}))
+
+    # 步骤5：所有栏位一起做一对一匹配，复用结果中已占用的战备不再分配给其他栏位
+    if oneToOne:
+        reusedNames = [name for result in reusedResults.values() for name in result if name]
+        matchSlotsOneToOne(recognizedTexts, assetsData, recognizedResults, reusedNames)
+
+    for imageName in blankNames:
+        recognizedResults[imageName] = {"": ""}
+
+    # 识别结束，二值化结果的缓冲区归还给缓冲区池，供下一次F12复用
+    pendingSlots = None
+    bufferPool.release(binaryBatch)
+
+    for imageName, result in recognizedResults.items():
+        if imageName in fingerprints:
+            slotChangeDetector.store(imageName, fingerprints[imageName], result)
+
+    # 有序字典存储识别结果，按截图顺序合并复用和新识别的结果
+    localTesseractResults = {
+        imageName: reusedResults[imageName] if imageName in reusedResults else recognizedResults.get(imageName, {"": ""})
+        for imageName, _ in slots
+    }
 
-    # 顺序处理内存中的截图，避免同时处理过多图片占用内存
-    for i, screenshot in enumerate(screenshots):
-        imageName = f"screenshot{i+1}.png"
-        processImageFromMemory(screenshot, imageName, assetsData, localTesseractResults)
+    ocrLogger.info(f"OCR识别总耗时: {(time.perf_counter() - recognitionStart) * 1000:.1f} ms（{len(screenshots)} 张截图）")
+    psmStats = psmScheduler.getStats()
+    ocrLogger.info(f"PSM调度累计：执行 {psmStats['passesRun']} 次，提前结束节省 {psmStats['passesSaved']} 次"
+                   f"（提前结束 {psmStats['earlyExits']} 个栏位），空栏位跳过 {psmStats['passesSkipped']} 次"
+                   f"（{psmStats['blankSlots']} 个栏位）")
 
     # 将识别结果存储到全局变量中
     global tesseractResults
@@ -526,13 +3049,16 @@ globalState = {
     "initialWindow": None,
     "windowTextWidget": None,  # 替换原StringVar，改用Text组件
     "numpadBindings": None,  # 新增：存储绑定信息
-    "activeThreads": {},  # 新增：跟踪活跃的按键模拟线程
+    "bindingTable": MappingProxyType({}),  # 编译后的只读分发表：虚拟键码 -> CompiledBinding
+    "inputBackend": None,  # 常驻的输入后端（pynput/uinput/记录器），所有按键序列共用
+    "inputExecutor": None,  # 按顺序执行按键序列的常驻线程
     "mouseCenteringThread": None,  # 新增：用于存储鼠标中心固定线程
     "centerMouse": False  # 新增：标志位，控制是否持续固定鼠标在中心
 }
+recognitionLock = threading.Lock()  # 保护 screenshotTriggered 的检查和设置
 
 # 固定提示文本（始终显示在窗口顶部）
-fixedPrompt = "按下 F12 重新识别\n按下 F11 退出程序\n\n"
+fixedPrompt = "按下 F12 重新识别\n按下 F11 退出程序\n按下 F10 输出按键延迟统计\n\n"
 
 def setup_global_hotkeys():
     """设置全局热键"""
@@ -559,59 +3085,63 @@ def setup_global_hotkeys():
                 globalState["mouseCenteringThread"].join(timeout=1)  # 等待最多1秒让线程结束
             except:
                 pass
+        stopMenuWatcher()
+        stopInputExecutor()
+        closeInputBackend()
+        dumpLatencyReport()
+        shutdownOcrProcessPool()
+        closeMatchMemoCache()
         os._exit(0)
 
     def on_f12():
-        # 检查是否已经有截图线程在运行，避免重复触发
-        if globalState["screenshotTriggered"]:
-            mainLogger.info("F12已被触发，当前识别流程正在进行中，忽略新的触发")
-            print("F12已被触发，当前识别流程正在进行中，忽略新的触发")
-            return
         # F12 触发识别流程：防重复触发+更新窗口文本+开线程执行任务（支持重复触发）
         mainLogger.info("收到F12重新识别指令")
-        # 移动鼠标到屏幕中心以确保截图一致性
-        try:
-            screenWidth, screenHeight = pyautogui.size()
-            centerX, centerY = screenWidth // 2, screenHeight // 2
-            pyautogui.moveTo(centerX, centerY)
-        except Exception as e:
-            mainLogger.error(f"移动鼠标到屏幕中心失败: {e}")
-        # 设置触发状态，防止重复点击
-        globalState["screenshotTriggered"] = True
-        updateWindowContent("识别中...")
-        screenshotThread = threading.Thread(target=runScreenshot)
-        screenshotThread.start()
+        if not startRecognition():
+            # 已经有识别流程在运行（F12或菜单监视触发），避免重复触发
+            mainLogger.info("F12已被触发，当前识别流程正在进行中，忽略新的触发")
+            print("F12已被触发，当前识别流程正在进行中，忽略新的触发")
+
+    def on_f10():
+        # F10 输出按键延迟统计（F10不是小键盘按键，不在分发表中）
+        dumpLatencyReport()
 
     # 创建全局热键监听器
     hotkey_listener = keyboard.GlobalHotKeys({
+        '<f10>': on_f10,
         '<f11>': on_f11,
         '<f12>': on_f12
     })
     return hotkey_listener
 
 
-# 创建统一的键盘事件处理函数（处理小键盘按键）
-def unifiedOnPress(key):
-    """统一的键盘事件处理函数，处理小键盘按键（F11/F12由全局热键处理）"""
-    try:
-        # 处理小键盘按键（仅在绑定完成后）
-        if globalState["numpadBindings"]:
-            onPressHandler(key, globalState["numpadBindings"], Controller())
-    except Exception as e:
-        mainLogger.error(f"键盘事件处理出错: {e}")
+def startRecognition(autoTriggered=False):
+    """开线程执行识别流程（F12或菜单监视触发），已有识别流程在运行时返回False"""
+    # 热键线程和菜单监视线程可能同时触发，检查和设置触发状态必须是原子的
+    with recognitionLock:
+        if globalState["screenshotTriggered"]:
+            return False
+        # 设置触发状态，防止重复点击
+        globalState["screenshotTriggered"] = True
+    updateWindowContent("识别中...")
+    screenshotThread = threading.Thread(target=runScreenshot, args=(autoTriggered,))
+    screenshotThread.start()
+    return True
 
 
 def onPress(key):
-    # 调用统一的键盘事件处理函数，只处理非全局热键
+    """小键盘监听的热路径：按虚拟键码查一次分发表，命中时把编译好的按键序列交给输入执行器
+
+    F11/F12等非小键盘按键不在分发表中，直接忽略（由GlobalHotKeys处理）。
+    """
+    startTime = time.perf_counter()
     try:
-        # 检查是否是全局热键（F11或F12），如果是则跳过处理
-        if hasattr(key, 'vk'):
-            if key.vk in [122, 123]:  # F11=122, F12=123
-                return  # 跳过全局热键，由GlobalHotKeys处理
-        else:
-            if key in [Key.f11, Key.f12]:
-                return  # 跳过全局热键，由GlobalHotKeys处理
-        unifiedOnPress(key)
+        binding = globalState["bindingTable"].get(getattr(key, 'vk', None))
+        if binding is not None:
+            trace = KeyTrace(startTime) if latencyTraceEnabled else None
+            if trace is not None:
+                trace.dispatch = time.perf_counter()
+            getInputExecutor().submit(binding.numKey, runCompiledBinding, binding, trace)
+            listenerTimer.record(time.perf_counter() - startTime)
     except Exception as e:
         mainLogger.error(f"键盘事件处理出错: {e}")
 
@@ -621,14 +3151,14 @@ def loadJsonFromEmbeddedData(configName):
     if configName == "basic":
         return basicConfig
     elif configName == "assets":
-        return assetsData
+        return getAssetCatalog().tree
     else:
         return {}
 
 
 # 从内嵌数据提取所有「中文名称:指令」键值对
-def extractTesseractData(tesseractData):
-    """解析 tesseractResults 嵌套结构，返回 {中文名称: 指令} 的扁平字典"""
+def extractTesseractData(tesseractData, verbose=True):
+    """解析 tesseractResults 嵌套结构，返回 {中文名称: 指令} 的扁平字典（verbose 为False时不记录空栏位和条数）"""
     combinedData = {}
     if not isinstance(tesseractData, dict):
         mainLogger.error("tesseractResults 格式错误，不是字典类型")
@@ -646,37 +3176,19 @@ def extractTesseractData(tesseractData):
                 combinedData[chineseName] = command
             else:
                 # 如果识别失败（中文名称为空），跳过此项
-                mainLogger.warning(f"截图 {screenshotName} 识别结果为空，跳过")
+                if verbose:
+                    mainLogger.warning(f"截图 {screenshotName} 识别结果为空，跳过")
         else:
             mainLogger.warning(f"截图 {screenshotName} 的识别结果格式异常，跳过")
             print(f"截图 {screenshotName} 的识别结果格式异常，跳过")
 
-    mainLogger.info(f"从 tesseractResults 提取到 {len(combinedData)} 条有效绑定数据")
+    if verbose:
+        mainLogger.info(f"从 tesseractResults 提取到 {len(combinedData)} 条有效绑定数据")
     return combinedData
 
 
-# 解析 Assets语言配置文件，提取 Map/Player 分类的所有名称
-def parseAssetsCategory(assetsData):
-    """从assetsData中提取Map分类和Player分类的所有中文名称集合"""
-    mapCategory = set()
-    playerCategory = set()
-
-    # 提取Map分类的所有项
-    if "Map" in assetsData and isinstance(assetsData["Map"], dict):
-        mapCategory = set(assetsData["Map"].keys())
-
-    # 提取Player分类（包含R/G/B子分类）的所有项
-    if "Player" in assetsData and isinstance(assetsData["Player"], dict):
-        for subCategory in ["R", "G", "B"]:
-            if subCategory in assetsData["Player"] and isinstance(assetsData["Player"][subCategory], dict):
-                playerCategory.update(assetsData["Player"][subCategory].keys())
-
-    mainLogger.info(f"从assetsData解析到Map分类项：{len(mapCategory)} 个, Player分类项：{len(playerCategory)} 个")
-    return mapCategory, playerCategory
-
-
 # 按分类绑定按键（核心逻辑）
-def bindKeys(tesseractCombined, keyConfig, mapCategory, playerCategory):
+def bindKeys(tesseractCombined, keyConfig, mapCategory, playerCategory, verbose=True):
     # 初始化小键盘按键映射（基于basic.json配置）
     numpadKeys = {
         keyConfig["reinforce"]: None,  # 0 → 增援（Map分类）
@@ -718,8 +3230,9 @@ def bindKeys(tesseractCombined, keyConfig, mapCategory, playerCategory):
     for mapKey in mapKeyOrder:
         if numpadKeys[mapKey] is None:  # 如果该键还未被使用
             # numpadKeys[mapKey] = ("地狱火炸弹", hellfireCommand)
-            mainLogger.info(f"已将'地狱火炸弹'绑定到小键盘 {mapKey} 键")
-            print(f"已将'地狱火炸弹'绑定到小键盘 {mapKey} 键")
+            if verbose:
+                mainLogger.info(f"已将'地狱火炸弹'绑定到小键盘 {mapKey} 键")
+                print(f"已将'地狱火炸弹'绑定到小键盘 {mapKey} 键")
             break  # 只绑定到第一个可用的键
 
     # ========== 第二步：处理Player分类 ==========
@@ -734,9 +3247,9 @@ def bindKeys(tesseractCombined, keyConfig, mapCategory, playerCategory):
         if i < len(playerKeyOrder):
             numpadKeys[playerKeyOrder[i]] = (item, tesseractCombined[item])
 
-    # 打印绑定结果
+    # 打印绑定结果（增量绑定的中间结果不打印）
     for key, value in numpadKeys.items():
-        if value:
+        if value and verbose:
             print(f"小键盘 {key} 绑定到: {value[0]} - {value[1]}")
 
     return numpadKeys
@@ -750,116 +3263,627 @@ wasdToArrow = {
     "d": "→"
 }
 
-# 方向键映射，预定义常用键以提高性能
-arrowKeysMap = {
-    'w': Key.up,
-    'a': Key.left,
-    's': Key.down,
-    'd': Key.right
-}
+# wasd 对应的逻辑方向键名，由输入后端转换成各自的按键对象
+arrowKeyNames = {'w': "up", 'a': "left", 's': "down", 'd': "right"}
 
 
 def loadAssetsCategory():
-    """从assetsData，返回{战备名称: 分类(Map/R/G/B)}的映射"""
-    categoryMap = {}
-    currentAssetsData = assetsData  # 使用内嵌数据
-    # 处理Map分类
-    if "Map" in currentAssetsData and isinstance(currentAssetsData["Map"], dict):
-        for name in currentAssetsData["Map"].keys():
-            categoryMap[name] = "Map"
-    # 处理Player下的R/G/B分类
-    if "Player" in currentAssetsData and isinstance(currentAssetsData["Player"], dict):
-        for subCat in ["R", "G", "B"]:
-            if subCat in currentAssetsData["Player"] and isinstance(currentAssetsData["Player"][subCat], dict):
-                for name in currentAssetsData["Player"][subCat].keys():
-                    categoryMap[name] = subCat
-    return categoryMap
+    """返回{战备名称: 分类(Map/R/G/B)}的映射
 
+    悬浮窗在界面线程上调用：战备目录尚未加载时直接读取战备库JSON，
+    不在这里导入NumPy或编译匹配索引，以免拖慢首次绘制悬浮窗。
+    """
+    catalog = assetCatalog
+    if catalog is not None:
+        return catalog.categories
+    tree = loadJson(assetsConfigPath)
+    if not isinstance(tree, dict):
+        return {}
+    return {name: category for category, entries in iterCategoryGroups(tree) for name in entries}
 
-# 优化的按键模拟操作，减少延迟并避免与其他按键冲突
-def simulateKeyPress(key, numpadBindings, keyboardController):
-    binding = numpadBindings.get(key)
-    if binding:
-        item, command = binding
-        # 将 wasd 转换为方向键字符串
-        arrowCommand = "".join(wasdToArrow.get(char, char) for char in command)
-        print(f"按下小键盘 {key}，执行命令: {arrowCommand}")
 
-        try:
-            # 按住 Ctrl 键
-            keyboardController.press(Key.ctrl)
-            time.sleep(0.03)  # 短暂等待确保Ctrl键生效
-
-            # 执行组合键 - 按顺序逐个按键，包括重复按键
-            for char in command:
-                arrowKey = arrowKeysMap.get(char)  # 使用预定义的映射
-                if arrowKey:
-                    # 按下按键
-                    keyboardController.press(arrowKey)
-                    time.sleep(0.03)  # 短暂按下时间
-                    # 立即释放按键
-                    keyboardController.release(arrowKey)
-                    time.sleep(0.03)  # 按键间隔
-
-            # 等待一小段时间让游戏响应
-            time.sleep(0.03)
-
-            # 松开 Ctrl 键
-            keyboardController.release(Key.ctrl)
+# ===================== 按键输入执行器 =====================
+# 所有战备按键序列都交给一个常驻线程按顺序执行，不同小键盘按键的 Ctrl/方向键 事件不会在同一个输入后端上交错
 
-        except Exception as e:
-            mainLogger.error(f"按键模拟失败: {e}")
-            print(f"按键模拟失败: {e}")
-            # 确保即使出错也释放Ctrl键
+spinSeconds = 0.002  # 高精度等待时最后忙等的时长
+
+
+def preciseSleep(seconds):
+    """高精度等待：大部分时间交给 time.sleep，最后 spinSeconds 忙等，避免系统定时器粒度带来的误差"""
+    deadline = time.perf_counter() + seconds
+    if seconds > spinSeconds:
+        time.sleep(seconds - spinSeconds)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class InputExecutor:
+    """单线程、有界队列的按键序列执行器
+
+    同一个小键盘按键重复按下时的策略：
+      drop    - 该按键的序列正在执行或排队时忽略新的按下（默认，与原来的行为一致）
+      queue   - 每次按下都排队执行
+      replace - 丢弃该按键尚未开始的序列，改为排队最新的一次
+    队列已满时丢弃新的按下。
+    """
+
+    policies = ("drop", "queue", "replace")
+
+    def __init__(self, maxQueue=4, policy="drop"):
+        self.maxQueue = max(1, int(maxQueue))
+        self.policy = policy if policy in self.policies else "drop"
+        self.pending = deque()      # [(按键, 任务, 参数, 入队时刻)]
+        self.pendingCounts = Counter()  # 按键 -> 排队中的序列数，避免每次提交都遍历队列
+        self.runningKey = None
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.submitted = 0
+        self.executed = 0
+        self.dropped = 0
+        self.replaced = 0
+        self.maxDepth = 0
+        self.totalWait = 0.0
+        self.maxWait = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.timerPeriodSet = False
+
+    def start(self):
+        # Windows默认定时器粒度约15.6ms，执行器运行期间提高到1ms
+        if sys.platform == 'win32':
             try:
-                keyboardController.release(Key.ctrl)
-            except:
+                self.timerPeriodSet = ctypes.windll.winmm.timeBeginPeriod(1) == 0
+            except Exception:
                 pass
-            # 清理活跃线程状态
-            globalState["activeThreads"].pop(key, None)
+        self.thread.start()
+        return self
+
+    def submit(self, key, task, *args):
+        """提交一个按键序列，返回是否被接受"""
+        with self.condition:
+            self.submitted += 1
+            if self.stopped:
+                return False
+            pendingSame = self.pendingCounts[key]
+            if self.policy == "drop" and (pendingSame or self.runningKey == key):
+                self.dropped += 1
+                return False
+            if self.policy == "replace" and pendingSame:
+                self.pending = deque(entry for entry in self.pending if entry[0] != key)
+                self.pendingCounts[key] = 0
+                self.replaced += pendingSame
+            if len(self.pending) >= self.maxQueue:
+                self.dropped += 1
+                mainLogger.warning(f"按键队列已满（{self.maxQueue}），忽略小键盘 {key}")
+                return False
+            self.pending.append((key, task, args, time.perf_counter()))
+            self.pendingCounts[key] += 1
+            self.maxDepth = max(self.maxDepth, len(self.pending))
+            self.condition.notify()
+            return True
 
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                key, task, args, enqueuedAt = self.pending.popleft()
+                self.pendingCounts[key] -= 1
+                self.runningKey = key
+            waitSeconds = time.perf_counter() - enqueuedAt
+            try:
+                task(*args)
+            except Exception as e:
+                mainLogger.error(f"执行小键盘 {key} 的按键序列失败: {e}")
+            with self.condition:
+                self.runningKey = None
+                self.executed += 1
+                self.totalWait += waitSeconds
+                self.maxWait = max(self.maxWait, waitSeconds)
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.pending.clear()
+            self.pendingCounts.clear()
+            self.condition.notify_all()
+        if self.timerPeriodSet:
+            ctypes.windll.winmm.timeEndPeriod(1)
+            self.timerPeriodSet = False
+
+    def getStats(self):
+        with self.condition:
+            return {"depth": len(self.pending), "maxDepth": self.maxDepth, "submitted": self.submitted,
+                    "executed": self.executed, "dropped": self.dropped, "replaced": self.replaced,
+                    "averageWait": self.totalWait / self.executed if self.executed else 0.0,
+                    "maxWait": self.maxWait}
+
+
+def getInputExecutor():
+    """返回常驻的按键输入执行器，第一次调用时按配置创建并启动"""
+    executor = globalState["inputExecutor"]
+    if executor is None:
+        executor = InputExecutor(basicConfig.get("input_queue_size", 4),
+                                 basicConfig.get("input_repeat_policy", "drop")).start()
+        globalState["inputExecutor"] = executor
+    return executor
+
+
+def stopInputExecutor():
+    """停止输入执行器并输出排队统计"""
+    executor = globalState["inputExecutor"]
+    if executor is None:
+        return
+    executor.stop()
+    stats = executor.getStats()
+    mainLogger.info(f"按键执行器：提交 {stats['submitted']} 次，执行 {stats['executed']} 次，"
+                    f"忽略 {stats['dropped']} 次，替换 {stats['replaced']} 次；最大队列深度 {stats['maxDepth']}，"
+                    f"平均等待 {stats['averageWait'] * 1000:.1f} ms，最长等待 {stats['maxWait'] * 1000:.1f} ms")
+    timing = listenerTimer.getStats()
+    if timing["count"]:
+        mainLogger.info(f"小键盘监听回调：{timing['count']} 次，平均 {timing['average'] * 1e6:.1f} µs，"
+                        f"p99 {timing['p99'] * 1e6:.1f} µs，最长 {timing['max'] * 1e6:.1f} µs")
+
+
+# ===================== 按键时序配置 =====================
+# 四段等待时间：Ctrl按下后、方向键按住、方向键之间、松开Ctrl前（毫秒）
+keyTimingFields = ("ctrl_delay_ms", "press_ms", "gap_ms", "release_delay_ms")
+keyTimingProfiles = {
+    "conservative": {"ctrl_delay_ms": 30, "press_ms": 30, "gap_ms": 30, "release_delay_ms": 30},
+    "fast": {"ctrl_delay_ms": 15, "press_ms": 20, "gap_ms": 15, "release_delay_ms": 15},
+}
 
-# 键盘事件处理函数 - 优化性能
-def onPressHandler(key, numpadBindings, keyboardController):
-    try:
-        # 使用字典查找优化性能
-        if hasattr(key, 'vk'):
-            # 优化键值判断
-            if 96 <= key.vk <= 105:  # 小键盘数字键 0-9
-                numKey = str(key.vk - 96)
-            elif key.vk == 110:  # 小键盘小数点键
-                numKey = "."
-            else:
-                return  # 不是目标按键，直接返回
-
-            binding = numpadBindings.get(numKey)
-            if binding:
-                item, command = binding
-                # 将 wasd 转换为方向键字符串
-                arrowCommand = "".join(wasdToArrow.get(char, char) for char in command)
-                print(f"按下了小键盘 {numKey}，绑定到: {item} - {arrowCommand}")
-
-                # 检查是否已有相同按键的线程正在运行
-                activeThreads = globalState["activeThreads"]
-                if numKey not in activeThreads or not activeThreads[numKey].is_alive():
-                    # 在新线程中执行按键模拟，避免阻塞监听器
-                    thread = threading.Thread(
-                        target=simulateKeyPress,
-                        args=(numKey, numpadBindings, keyboardController)
-                    )
-                    thread.daemon = True  # 设置为守护线程
-                    thread.start()
-                    # 记录活跃线程
-                    activeThreads[numKey] = thread
-                else:
-                    # 只在调试模式下输出重复触发信息
-                    if os.getenv('DEBUG_MODE'):
-                        print(f"小键盘 {numKey} 的按键模拟仍在执行中，忽略重复触发")
 
-    except AttributeError:
+def resolveKeyTiming(profileName, key=None):
+    """按 档位 → 小键盘按键的单独覆盖 合并出时序，返回 (Ctrl按下后, 按住, 间隔, 松开Ctrl前)，单位秒
+
+    档位可选 conservative / fast / custom（custom 读取 key_timing_custom，缺少的字段沿用 conservative）；
+    key_timing_overrides 中以小键盘按键为键的字典可以单独覆盖任意字段。
+    """
+    timing = dict(keyTimingProfiles["conservative"])
+    if profileName == "custom":
+        timing.update(basicConfig.get("key_timing_custom", {}))
+    elif profileName in keyTimingProfiles:
+        timing.update(keyTimingProfiles[profileName])
+    else:
+        mainLogger.warning(f"未知的按键时序档位 {profileName}，使用 conservative")
+    if key is not None:
+        timing.update(basicConfig.get("key_timing_overrides", {}).get(key, {}))
+    return tuple(max(0.0, float(timing[field])) / 1000 for field in keyTimingFields)
+
+
+keyTimingCache = {}
+
+
+def getKeyTiming(key):
+    """返回小键盘按键当前使用的时序（按配置解析一次后缓存）"""
+    timing = keyTimingCache.get(key)
+    if timing is None:
+        timing = resolveKeyTiming(basicConfig.get("key_timing_profile", "conservative"), key)
+        keyTimingCache[key] = timing
+    return timing
+
+
+# ===================== 输入后端 =====================
+# 模拟按键通过统一的后端接口发出：pynput（默认）、Linux uinput 虚拟键盘、只在内存中记录事件的记录器。
+# 后端用逻辑键名（ctrl/up/down/left/right）换取自己的按键对象，编译绑定时转换一次，按键时直接使用
+
+class InputBackend:
+    """输入后端基类：key() 把逻辑键名转换为本后端的按键对象，press()/release() 发出按键事件"""
+
+    name = "base"
+
+    def __init__(self):
+        self.ctrlKey = self.key("ctrl")
+
+    def key(self, name):
+        raise NotImplementedError
+
+    def press(self, key):
+        raise NotImplementedError
+
+    def release(self, key):
+        raise NotImplementedError
+
+    def close(self):
         pass
+
+
+class PynputBackend(InputBackend):
+    """通过 pynput 的 Controller 模拟按键（Windows 下为 SendInput）"""
+
+    name = "pynput"
+
+    def __init__(self):
+        importInputModules()
+        self.controller = Controller()
+        super().__init__()
+
+    def key(self, name):
+        return getattr(Key, name)
+
+    def press(self, key):
+        self.controller.press(key)
+
+    def release(self, key):
+        self.controller.release(key)
+
+
+class UinputBackend(InputBackend):
+    """直接向 /dev/uinput 创建的虚拟键盘写入内核输入事件，绕过 X11/XTest，仅支持 Linux（需要写 /dev/uinput 的权限）"""
+
+    name = "uinput"
+    keyCodes = {"ctrl": 29, "up": 103, "left": 105, "right": 106, "down": 108}  # linux/input-event-codes.h
+    EV_SYN, EV_KEY, SYN_REPORT = 0, 1, 0
+    UI_SET_EVBIT, UI_SET_KEYBIT = 0x40045564, 0x40045565
+    UI_DEV_SETUP, UI_DEV_CREATE, UI_DEV_DESTROY = 0x405c5503, 0x5501, 0x5502
+    BUS_VIRTUAL = 0x06
+    eventFormat = struct.Struct("@llHHi")  # struct input_event：timeval + type + code + value
+
+    def __init__(self, devicePath="/dev/uinput", deviceName=b"HelldiverAutoAssets"):
+        import fcntl
+        self.fcntl = fcntl
+        self.fd = os.open(devicePath, os.O_WRONLY | os.O_NONBLOCK)
+        try:
+            fcntl.ioctl(self.fd, self.UI_SET_EVBIT, self.EV_KEY)
+            fcntl.ioctl(self.fd, self.UI_SET_EVBIT, self.EV_SYN)
+            for code in self.keyCodes.values():
+                fcntl.ioctl(self.fd, self.UI_SET_KEYBIT, code)
+            inputId = struct.pack("HHHH", self.BUS_VIRTUAL, 0x1, 0x1, 1)
+            try:
+                # struct uinput_setup（内核 4.5+）
+                fcntl.ioctl(self.fd, self.UI_DEV_SETUP, inputId + deviceName.ljust(80, b"\0")[:80] + struct.pack("I", 0))
+            except OSError:
+                # 旧内核：写入 struct uinput_user_dev
+                os.write(self.fd, deviceName.ljust(80, b"\0")[:80] + inputId + struct.pack("I", 0) + bytes(4 * 64 * 4))
+            fcntl.ioctl(self.fd, self.UI_DEV_CREATE)
+        except Exception:
+            os.close(self.fd)
+            raise
+        # 等待桌面环境识别新设备，否则最初几个事件可能丢失
+        time.sleep(0.2)
+        super().__init__()
+
+    def key(self, name):
+        return self.keyCodes[name]
+
+    def emit(self, code, value):
+        os.write(self.fd, self.eventFormat.pack(0, 0, self.EV_KEY, code, value)
+                 + self.eventFormat.pack(0, 0, self.EV_SYN, self.SYN_REPORT, 0))
+
+    def press(self, key):
+        self.emit(key, 1)
+
+    def release(self, key):
+        self.emit(key, 0)
+
+    def close(self):
+        if self.fd is None:
+            return
+        try:
+            self.fcntl.ioctl(self.fd, self.UI_DEV_DESTROY)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+
+
+class RecordingBackend(InputBackend):
+    """只在内存中记录 按下/松开 事件和时间戳，用于测试和基准，不会真正发出按键"""
+
+    name = "recorder"
+
+    def __init__(self):
+        self.events = []  # [("press"/"release", 逻辑键名, 时间戳)]
+        super().__init__()
+
+    def key(self, name):
+        return name
+
+    def press(self, key):
+        self.events.append(("press", key, time.perf_counter()))
+
+    def release(self, key):
+        self.events.append(("release", key, time.perf_counter()))
+
+
+inputBackendClasses = {backend.name: backend for backend in (PynputBackend, UinputBackend, RecordingBackend)}
+
+
+def createInputBackend(name):
+    """按名称创建输入后端，名称无效或创建失败时退回 pynput"""
+    backendClass = inputBackendClasses.get(name)
+    if backendClass is None:
+        mainLogger.warning(f"未知的输入后端 {name}，使用 pynput")
+        backendClass = PynputBackend
+    try:
+        return backendClass()
     except Exception as e:
-        mainLogger.error(f"键盘事件处理出错: {e}")
+        if backendClass is PynputBackend:
+            raise
+        mainLogger.error(f"创建输入后端 {name} 失败，使用 pynput: {e}")
+        print(f"创建输入后端 {name} 失败，使用 pynput: {e}")
+        return PynputBackend()
+
+
+inputBackendLock = threading.Lock()  # 热键、执行器和校准线程可能同时首次获取，uinput 不能创建两个虚拟键盘
+
+
+def getInputBackend():
+    """返回常驻的输入后端，第一次调用时按配置创建"""
+    with inputBackendLock:
+        backend = globalState["inputBackend"]
+        if backend is None:
+            backend = createInputBackend(basicConfig.get("input_backend", "pynput"))
+            mainLogger.info(f"输入后端：{backend.name}")
+            globalState["inputBackend"] = backend
+        return backend
+
+
+def closeInputBackend():
+    """释放输入后端（uinput 后端会销毁虚拟键盘）"""
+    with inputBackendLock:
+        backend = globalState["inputBackend"]
+        if backend is None:
+            return
+        globalState["inputBackend"] = None
+    try:
+        backend.close()
+    except Exception as e:
+        mainLogger.error(f"关闭输入后端失败: {e}")
+
+
+def toArrowKeys(command, backend):
+    """把 wasd 指令转换为指定后端的方向键对象元组"""
+    return tuple(backend.key(arrowKeyNames[char]) for char in command if char in arrowKeyNames)
+
+
+def pressSequence(command, backend, timing):
+    """按住Ctrl依次按下并松开方向键，timing 为 resolveKeyTiming 返回的四段等待时间"""
+    pressKeys(toArrowKeys(command, backend), backend, timing)
+
+
+def pressKeys(arrowKeys, backend, timing, trace=None):
+    """与 pressSequence 相同，但使用预先转换好的方向键元组；trace 不为空时记录每个注入事件的时刻"""
+    ctrlDelay, pressDuration, keyGap, releaseDelay = timing
+    markEvent = trace.events.append if trace is not None else None
+    # 按住 Ctrl 键
+    backend.press(backend.ctrlKey)
+    if markEvent:
+        markEvent(time.perf_counter())
+    preciseSleep(ctrlDelay)  # 短暂等待确保Ctrl键生效
+
+    # 执行组合键 - 按顺序逐个按键，包括重复按键
+    for arrowKey in arrowKeys:
+        # 按下按键
+        backend.press(arrowKey)
+        if markEvent:
+            markEvent(time.perf_counter())
+        preciseSleep(pressDuration)  # 短暂按下时间
+        # 立即释放按键
+        backend.release(arrowKey)
+        if markEvent:
+            markEvent(time.perf_counter())
+        preciseSleep(keyGap)  # 按键间隔
+
+    # 等待一小段时间让游戏响应
+    preciseSleep(releaseDelay)
+
+    # 松开 Ctrl 键
+    backend.release(backend.ctrlKey)
+    if markEvent:
+        markEvent(time.perf_counter())
+
+
+# ===================== 编译后的按键绑定表 =====================
+# 每次识别绑定后把 {小键盘按键: (战备名称, 指令)} 编译成 {虚拟键码: CompiledBinding}，
+# 方向键元组、显示文本和按键时序都在编译时准备好，监听器回调中只剩一次字典查找和入队
+
+numpadVkCodes = {96 + digit: str(digit) for digit in range(10)}  # 小键盘数字键 0-9
+numpadVkCodes[110] = "."                                          # 小键盘小数点键
+
+CompiledBinding = namedtuple("CompiledBinding", "numKey item arrowKeys display timing")
+
+
+def compileBindings(numpadBindings):
+    """把 bindKeys 的结果编译成只读分发表 {虚拟键码: CompiledBinding}，方向键转换为当前输入后端的按键对象"""
+    backend = getInputBackend()
+    table = {}
+    for vk, numKey in numpadVkCodes.items():
+        binding = numpadBindings.get(numKey)
+        if binding:
+            item, command = binding
+            # 将 wasd 转换为方向键字符串
+            display = "".join(wasdToArrow.get(char, char) for char in command)
+            table[vk] = CompiledBinding(numKey, item, toArrowKeys(command, backend), display, getKeyTiming(numKey))
+    return MappingProxyType(table)
+
+
+# 优化的按键模拟操作，减少延迟并避免与其他按键冲突
+def runCompiledBinding(binding, trace=None):
+    """在输入执行器线程中执行一个编译好的按键序列，trace 不为空时记录各阶段时间戳"""
+    if trace is not None:
+        trace.start = time.perf_counter()
+    print(f"按下小键盘 {binding.numKey}，绑定到: {binding.item} - {binding.display}")
+    backend = getInputBackend()
+    try:
+        pressKeys(binding.arrowKeys, backend, binding.timing, trace)
+        if trace is not None:
+            latencyTracer.record(f"{binding.numKey} {binding.item}", trace)
+    except Exception as e:
+        mainLogger.error(f"按键模拟失败: {e}")
+        print(f"按键模拟失败: {e}")
+        # 确保即使出错也释放Ctrl键
+        try:
+            backend.release(backend.ctrlKey)
+        except:
+            pass
+
+
+class ListenerTimer:
+    """统计耗时样本（最近 capacity 次）：监听器回调用于确认热路径保持在微秒级，截图后端用于对比截图耗时"""
+
+    def __init__(self, capacity=4096):
+        self.samples = deque(maxlen=capacity)
+        self.count = 0
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def getStats(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {"count": 0, "average": 0.0, "p99": 0.0, "max": 0.0}
+        return {"count": self.count, "average": sum(samples) / len(samples),
+                "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))], "max": samples[-1]}
+
+
+listenerTimer = ListenerTimer()
+
+
+# ===================== 按键延迟追踪 =====================
+# 从按下小键盘到最后一个方向键发出的端到端延迟：监听回调、提交给执行器、执行器开始、
+# 每个注入事件、松开Ctrl 都记录一次 perf_counter（单调时钟），按绑定汇总成 p50/p95/p99
+
+latencyStages = ("dispatch", "executor_start", "first_event", "last_arrow", "ctrl_release")
+
+
+class KeyTrace:
+    """一次按键序列的时间戳，各字段都是相对同一单调时钟的秒数"""
+
+    __slots__ = ("listener", "dispatch", "start", "events")
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.dispatch = listener
+        self.start = None
+        self.events = []  # 每个注入事件（按下/松开）发出后的时刻，最后一个为松开Ctrl
+
+    def stageLatencies(self):
+        """返回 {阶段: 距监听回调的秒数}"""
+        events = self.events
+        # 最后一个方向键按下是倒数第三个事件（其后为该方向键松开和Ctrl松开）
+        return {"dispatch": self.dispatch - self.listener,
+                "executor_start": self.start - self.listener,
+                "first_event": events[0] - self.listener,
+                "last_arrow": events[max(0, len(events) - 3)] - self.listener,
+                "ctrl_release": events[-1] - self.listener}
+
+
+class LatencyTracer:
+    """按绑定汇总各阶段延迟（每个阶段保留最近 capacity 个样本），按需输出分位数"""
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.samples = {}  # {绑定名称: {阶段: deque}}
+        self.counts = Counter()
+
+    def record(self, label, trace):
+        if not trace.events or trace.start is None:
+            return
+        latencies = trace.stageLatencies()
+        with self.lock:
+            stages = self.samples.get(label)
+            if stages is None:
+                stages = {stage: deque(maxlen=self.capacity) for stage in latencyStages}
+                self.samples[label] = stages
+            for stage, value in latencies.items():
+                stages[stage].append(value)
+            self.counts[label] += 1
+
+    @staticmethod
+    def percentile(sortedValues, fraction):
+        return sortedValues[min(len(sortedValues) - 1, int(len(sortedValues) * fraction))]
+
+    def getReport(self):
+        """返回 {绑定名称: {"count": 次数, 阶段: (p50, p95, p99)}}"""
+        with self.lock:
+            snapshot = {label: {stage: sorted(values) for stage, values in stages.items()}
+                        for label, stages in self.samples.items()}
+            counts = dict(self.counts)
+        report = {}
+        for label, stages in snapshot.items():
+            entry = {"count": counts[label]}
+            for stage, values in stages.items():
+                entry[stage] = tuple(self.percentile(values, fraction) for fraction in (0.5, 0.95, 0.99))
+            report[label] = entry
+        return report
+
+    def formatReport(self):
+        report = self.getReport()
+        if not report:
+            return "按键延迟统计：暂无记录"
+        lines = ["按键延迟统计（距小键盘监听回调，单位ms，p50 / p95 / p99）："]
+        for label, entry in sorted(report.items()):
+            lines.append(f"  {label}（{entry['count']} 次）")
+            for stage in latencyStages:
+                p50, p95, p99 = entry[stage]
+                lines.append(f"    {stage:<15} {p50 * 1000:7.2f} / {p95 * 1000:7.2f} / {p99 * 1000:7.2f}")
+        return "\n".join(lines)
+
+
+latencyTracer = LatencyTracer()
+latencyTraceEnabled = basicConfig.get("latency_trace", True)
+
+
+def dumpLatencyReport():
+    """输出按键延迟统计到控制台和日志（F10 或退出时调用）"""
+    if not latencyTraceEnabled:
+        return
+    text = latencyTracer.formatReport()
+    print(text)
+    mainLogger.info(text)
+
+
+def measureSequenceIntervals(events, ctrlKey="ctrl"):
+    """把一次序列的事件按四段时序分类，返回 {段名: [实际间隔秒数]}"""
+    intervals = {field: [] for field in keyTimingFields}
+    arrowEvents = [event for event in events if event[1] != ctrlKey]
+    ctrlPress = next(event[2] for event in events if event[0] == "press" and event[1] == ctrlKey)
+    ctrlRelease = next(event[2] for event in events if event[0] == "release" and event[1] == ctrlKey)
+    if not arrowEvents:
+        return intervals
+    intervals["ctrl_delay_ms"].append(arrowEvents[0][2] - ctrlPress)
+    for previous, current in zip(arrowEvents, arrowEvents[1:]):
+        field = "press_ms" if previous[0] == "press" else "gap_ms"
+        intervals[field].append(current[2] - previous[2])
+    # 最后一个方向键松开到松开Ctrl之间包含一次按键间隔和松开前等待
+    intervals["release_delay_ms"].append(ctrlRelease - arrowEvents[-1][2])
+    return intervals
+
+
+def runKeyTimingCalibration(sequences=("dswwass", "wdsaw", "ss"), repeats=20):
+    """按键时序校准：各档位在记录后端上回放战备序列，统计实际的事件间隔、抖动和整段耗时"""
+    profileNames = list(keyTimingProfiles) + ["custom"]
+    print(f"按键时序校准（每个档位回放 {len(sequences)} 个序列各 {repeats} 次，单位ms）")
+    for profileName in profileNames:
+        timing = resolveKeyTiming(profileName)
+        targets = dict(zip(keyTimingFields, timing))
+        targets["release_delay_ms"] += targets["gap_ms"]
+        intervals = {field: [] for field in keyTimingFields}
+        durations = []
+        keyCount = 0
+        for _ in range(repeats):
+            for command in sequences:
+                recorder = RecordingBackend()
+                pressSequence(command, recorder, timing)
+                for field, values in measureSequenceIntervals(recorder.events).items():
+                    intervals[field].extend(values)
+                durations.append(recorder.events[-1][2] - recorder.events[0][2])
+                keyCount += len(command)
+        print(f"  {profileName}：平均每个方向键 {sum(durations) / keyCount * 1000:.1f} ms，"
+              f"吞吐 {keyCount / sum(durations):.1f} 键/秒")
+        for field in keyTimingFields:
+            values = intervals[field]
+            if not values:
+                continue
+            meanValue = statistics.fmean(values)
+            jitter = statistics.pstdev(values)
+            worst = max(abs(value - targets[field]) for value in values)
+            print(f"    {field:<17} 目标 {targets[field] * 1000:6.1f}  实际平均 {meanValue * 1000:6.2f}  "
+                  f"抖动(标准差) {jitter * 1000:5.2f}  最大偏差 {worst * 1000:5.2f}")
 
 
 # 获取绑定信息
@@ -981,13 +4005,119 @@ def keepMouseCentered():
             time.sleep(0.5)  # 出错时稍长的休眠时间
 
 
-def runScreenshot():
-    """识别流程：截图 → OCR识别 → 执行绑定，读取并显示绑定信息"""
+# ===================== 增量绑定 =====================
+# 每个栏位识别完成（复用、空栏位、OCR结束或提前结束）就立即回调，不必等到全部栏位结束：
+# 前 k 个栏位都有结果时，对这 k 个栏位执行 bindKeys 并整体替换分发表、刷新悬浮窗。
+# bindKeys 按栏位顺序分配按键，只发布连续的前缀，后面栏位的结果不会让已经生效的按键错位。
+# 开启一对一匹配时前缀中的只是单个栏位的临时结果：后面的栏位以更高的相似度匹配到同一个战备时，
+# 最终发布会按一对一匹配的结果把已生效的按键改成别的战备。
+
+firstBindingTimer = ListenerTimer()  # 从开始识别到第一个绑定生效的耗时
+allBindingsTimer = ListenerTimer()   # 从开始识别到全部绑定生效的耗时
+
+
+def provisionalSlotResult(recognizedText, assetsData):
+    """一对一匹配之前，按单个栏位的最佳匹配得到临时结果（不输出到控制台）"""
+    if not recognizedText:
+        return {"": ""}
+    name, _ = peekAssetMatch(recognizedText, assetsData)  # 最终匹配时才计入缓存统计
+    return {name: assetsData.get(name, "")} if name else {"": ""}
+
+
+class StreamingBinder:
+    """按栏位顺序增量发布绑定，并记录首个绑定和全部绑定生效的耗时
+
+    回调都在识别线程中按顺序执行，不需要加锁。
+    oneToOne 为True时，临时结果中与前面栏位重名的栏位要等一对一匹配修正：
+    extractTesseractData按名称去重，提前发布会让已生效的小键盘键位整体错位。
+    """
+
+    def __init__(self, slotNames, keyConfig, mapCategory, playerCategory, startTime, oneToOne=False):
+        self.slotNames = list(slotNames)
+        self.keyConfig = keyConfig
+        self.mapCategory = mapCategory
+        self.playerCategory = playerCategory
+        self.startTime = startTime
+        self.results = {}
+        self.oneToOne = oneToOne
+        self.published = 0       # 已发布的前缀长度
+        self.publishedNames = set()  # 已发布前缀中的临时战备名称
+        self.firstBindingTime = None
+
+    def resolve(self, imageName, result):
+        """一个栏位有了结果；前缀变长时发布新的绑定"""
+        try:
+            self.results[imageName] = result
+            prefix = self.published
+            while prefix < len(self.slotNames) and self.slotNames[prefix] in self.results:
+                if self.oneToOne:
+                    # 重名栏位的临时结果不可靠，前缀停在这里，剩余栏位交给最终发布
+                    name = next(iter(self.results[self.slotNames[prefix]]), "")
+                    if name and name in self.publishedNames:
+                        break
+                    self.publishedNames.add(name)
+                prefix += 1
+            if prefix > self.published:
+                self.published = prefix
+                self.publish({name: self.results[name] for name in self.slotNames[:prefix]})
+        except Exception as e:
+            mainLogger.error(f"增量绑定失败: {e}")
+
+    def publish(self, results, final=False):
+        """对给定栏位结果执行绑定，整体替换分发表并刷新悬浮窗"""
+        numpadBindings = bindKeys(extractTesseractData(results, verbose=final), self.keyConfig,
+                                  self.mapCategory, self.playerCategory, verbose=final)
+        globalState["numpadBindings"] = numpadBindings
+        globalState["bindingTable"] = compileBindings(numpadBindings)
+        if self.firstBindingTime is None and any(numpadBindings.values()):
+            self.firstBindingTime = time.perf_counter() - self.startTime
+            firstBindingTimer.record(self.firstBindingTime)
+        updateGuiWithMemoryData()
+        return numpadBindings
+
+    def finish(self, results):
+        """全部栏位（含一对一匹配的修正）完成后发布最终绑定并记录耗时"""
+        numpadBindings = self.publish(results, final=True)
+        allTime = time.perf_counter() - self.startTime
+        allBindingsTimer.record(allTime)
+        firstStats, allStats = firstBindingTimer.getStats(), allBindingsTimer.getStats()
+        firstText = f"{self.firstBindingTime * 1000:.1f} ms" if self.firstBindingTime is not None else "无"
+        mainLogger.info(f"绑定生效耗时：首个绑定 {firstText}，全部绑定 {allTime * 1000:.1f} ms"
+                        f"（累计平均 首个 {firstStats['average'] * 1000:.1f} ms / 全部 {allStats['average'] * 1000:.1f} ms，"
+                        f"共 {allStats['count']} 次）")
+        return numpadBindings
+
+
+def runScreenshot(autoTriggered=False):
+    """识别流程：截图 → OCR识别 → 执行绑定，读取并显示绑定信息
+
+    autoTriggered 为True（菜单监视触发）时玩家正在操作，不移动鼠标也不模拟Ctrl。
+    """
+    recognitionStart = time.perf_counter()
     mainLogger.info("开始执行识别流程")
+    # 可选：用tracemalloc统计每次识别流程的内存峰值
+    traceMemory = basicConfig.get("trace_memory", False)
+    if traceMemory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
     try:
         print("开始执行识别流程：截图 → OCR识别 → 内置绑定")
+        # 快速启动模式下图像/OCR模块可能仍在后台导入，在这里等待完成（不阻塞热键线程）
+        importHeavyModules()
+        interactive = getCaptureBackend().interactive and not autoTriggered
+        if interactive:
+            requirePyautogui("移动鼠标和模拟Ctrl键")
+        # 移动鼠标到屏幕中心以确保截图一致性（回放录制画面时不需要）
+        if interactive:
+            try:
+                screenWidth, screenHeight = pyautogui.size()
+                centerX, centerY = screenWidth // 2, screenHeight // 2
+                pyautogui.moveTo(centerX, centerY)
+            except Exception as e:
+                mainLogger.error(f"移动鼠标到屏幕中心失败: {e}")
         # 启动鼠标居中线程（如果尚未启动）
-        if not globalState["mouseCenteringThread"] or not globalState["mouseCenteringThread"].is_alive():
+        if interactive and (not globalState["mouseCenteringThread"] or not globalState["mouseCenteringThread"].is_alive()):
             globalState["centerMouse"] = True
             mouseCenteringThread = threading.Thread(target=keepMouseCentered, daemon=True)
             mouseCenteringThread.start()
@@ -995,16 +4125,20 @@ def runScreenshot():
         
         # 1. 直接调用截图功能
         try:
-            screenshots = captureScreenshotsToMemory()
+            screenshots = captureScreenshotsToMemory(holdCtrl=not autoTriggered)
             mainLogger.info("截图功能运行成功")
             print("截图功能运行成功")
         except Exception as e:
             mainLogger.error(f"截图失败: {str(e)}")
             raise Exception(f"截图失败: {str(e)}")
 
-        # 2. 直接调用识别功能，传入内存中的截图
+        # 2. 直接调用识别功能，传入内存中的截图；每个栏位有结果就增量更新绑定
+        catalog = getAssetCatalog()
+        binder = StreamingBinder([f"screenshot{i+1}.png" for i in range(len(screenshots))],
+                                 loadJsonFromEmbeddedData("basic"), catalog.mapCategory, catalog.playerCategory,
+                                 recognitionStart, basicConfig.get("match_one_to_one", True))
         try:
-            runOcrRecognition(screenshots)
+            runOcrRecognition(screenshots, binder.resolve if basicConfig.get("stream_bindings", True) else None)
             mainLogger.info("OCR识别功能运行成功")
             print("OCR识别功能运行成功")
         except Exception as e:
@@ -1023,28 +4157,27 @@ def runScreenshot():
                 print("程序退出：tesseractResults/basic配置/assetsData 存在无效配置或数据缺失")
                 raise Exception("配置数据缺失或无效")
 
-            # 提取Tesseract数据 + 解析Assets分类
-            tesseractCombined = extractTesseractData(tesseractResults)
-            mapCategory, playerCategory = parseAssetsCategory(assetsData)
+            # 读取战备目录中预先算好的Assets分类
+            mainLogger.info(f"从assetsData解析到Map分类项：{len(catalog.mapCategory)} 个, "
+                            f"Player分类项：{len(catalog.playerCategory)} 个")
 
-            # 按分类绑定按键
-            numpadBindings = bindKeys(tesseractCombined, keyConfig, mapCategory, playerCategory)
+            # 按分类绑定全部栏位（包含一对一匹配的修正）；编译好的分发表整体替换，监听器不会读到一半更新的绑定，
+            # 同时更新窗口显示绑定信息
+            numpadBindings = binder.finish(tesseractResults)
 
-            # 输出并保存绑定信息
+            # 输出绑定信息
             bindingInfo = getBindingInfo(numpadBindings)
             for info in bindingInfo:
                 print(info)
 
-            # 保存绑定信息以便后续使用
-            globalState["numpadBindings"] = numpadBindings
+            # 识别成功，本次截图作为战备菜单监视的新签名
+            if menuWatcher is not None:
+                menuWatcher.acceptCandidate()
             # 注意：这里不再创建新的监听器，而是继续使用全局监听器
 
             mainLogger.info("绑定成功，键盘监听器已更新")
             print("绑定成功，键盘监听器已更新")
 
-            # 更新窗口显示绑定信息
-            updateGuiWithMemoryData()
-
         except Exception as e:
             mainLogger.error(f"绑定失败: {e}")
             raise Exception(f"绑定失败: {e}")
@@ -1069,13 +4202,19 @@ def runScreenshot():
             globalState["screenshotTriggered"] = False
         except:
             pass
+        if traceMemory:
+            currentMemory, peakMemory = tracemalloc.get_traced_memory()
+            poolStats = bufferPool.getStats()
+            mainLogger.info(f"识别流程内存：峰值 {peakMemory / 1024:.1f} KB，当前 {currentMemory / 1024:.1f} KB；"
+                            f"缓冲区池复用 {poolStats['hits']} 次 / 新分配 {poolStats['misses']} 次，"
+                            f"闲置 {poolStats['pooledBytes'] / 1024:.1f} KB")
         mainLogger.info("识别流程完成")
 
 
 def getWindowGeometry():
     """【核心】统一计算窗口尺寸+位置：按比例+最右侧+纵向居中"""
     try:
-        screenWidth, screenHeight = pyautogui.size()
+        screenWidth, screenHeight = getScreenSize()
         # 按比例计算窗口宽高，强制转整数（像素必须为整数）
         winW = int(screenWidth * windowWidthScale)
         winH = int(screenHeight * windowHeightScale)
@@ -1102,6 +4241,7 @@ def createInitialWindow():
     """创建初始窗口，尺寸/位置按比例计算，实现鼠标穿透+低透明度，适配多色Text组件"""
     mainLogger.info("创建初始窗口")
     root = tk.Tk()
+    globalState["initialWindow"] = root  # 提前保存，pyautogui尚未导入时用窗口查询屏幕分辨率
     winW, winH, winX, winY = getWindowGeometry()
 
     # 窗口基础样式（无边框、黑色背景、置顶）
@@ -1174,7 +4314,7 @@ def createInitialWindow():
     print(f"窗口X坐标: {winX}")
     print(f"窗口Y坐标: {winY}")
     try:
-        screenWidth, screenHeight = pyautogui.size()
+        screenWidth, screenHeight = getScreenSize()
         print(f"屏幕宽度: {screenWidth}")
         print(f"屏幕高度: {screenHeight}")
     except Exception as e:
@@ -1183,7 +4323,15 @@ def createInitialWindow():
 
 
 def main():
+    global basicConfig
     mainLogger.info("程序启动")
+    # 快速启动：悬浮窗和热键先就绪，图像/OCR模块在后台导入；关闭时在创建窗口前全部导入
+    fastStart = basicConfig.get("fast_start", True)
+    if fastStart:
+        enableDpiAwareness()
+    else:
+        importHeavyModules()
+        markStartup("导入图像/OCR模块")
     # 修复Text组件更新权限：封装updateWindowContent中临时启用/禁用
     def _safeUpdate(func):
         def wrapper(*args, **kwargs):
@@ -1199,26 +4347,30 @@ def main():
     global updateWindowContent
     updateWindowContent = _safeUpdate(updateWindowContent)
 
+    # 创建窗口
+    initialWindow = createInitialWindow()
+    # 程序启动时先显示等待识别状态
+    updateWindowContent("等待识别...")
+    # 立即绘制悬浮窗，不必等到进入mainloop
+    initialWindow.update()
+    markStartup("显示悬浮窗")
+
     # 获取屏幕分辨率并保存到basic.json
     try:
-        screenWidth, screenHeight = pyautogui.size()
+        screenWidth, screenHeight = getScreenSize()
         mainLogger.info(f"当前屏幕分辨率: 宽={screenWidth}px, 高={screenHeight}px")
         print(f"当前屏幕分辨率: 宽={screenWidth}px, 高={screenHeight}px")
         # 更新内嵌配置数据
-        global basicConfig
         basicConfig["screen_width"] = screenWidth
         basicConfig["screen_height"] = screenHeight
     except Exception as e:
         mainLogger.error(f"获取屏幕分辨率失败: {e}")
         print(f"获取屏幕分辨率失败: {e}")
+        initialWindow.destroy()
         return
 
-    # 创建窗口
-    initialWindow = createInitialWindow()
-    # 程序启动时先显示等待识别状态
-    updateWindowContent("等待识别...")
-
     # 启动全局热键监听器（F11和F12）
+    importInputModules()
     hotkey_listener = setup_global_hotkeys()
     # 在单独的线程中运行全局热键监听器
     hotkey_thread = threading.Thread(target=hotkey_listener.run)
@@ -1231,6 +4383,16 @@ def main():
     mainLogger.info("键盘监听器已启动")
     
     globalState["bindProcess"] = listener  # 将主监听器也存储在globalState中
+    markStartup("注册热键")
+    mainLogger.info(f"悬浮窗和热键已就绪，启动耗时 {(time.perf_counter() - processStartTime) * 1000:.1f} ms")
+
+    # 后台导入图像/OCR模块并预先启动OCR进程池或预热OCR引擎，首次F12时无需等待
+    threading.Thread(target=loadHeavyModulesInBackground, daemon=True).start()
+    # 监视战备库文件，修改后自动重新加载
+    startAssetFileWatcher()
+    # 可选：监视战备菜单，配装变化后自动识别
+    startMenuWatcher()
+
     initialWindow.mainloop()
 
     # 程序退出清理
@@ -1255,11 +4417,37 @@ def main():
             globalState["mouseCenteringThread"].join(timeout=1)  # 等待最多1秒让线程结束
         except:
             pass
-    
+
+    if assetFileWatcher is not None:
+        assetFileWatcher.stop()
+    stopMenuWatcher()
+    stopInputExecutor()
+    closeInputBackend()
+    dumpLatencyReport()
+    closeCaptureBackend()
+    shutdownOcrProcessPool()
+    if ocrEngine is not None:
+        ocrEngine.close()
+    closeMatchMemoCache()
     mainLogger.info("程序已退出")
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包环境下OCR进程池需要
     if sys.platform == 'win32':
         os.system('chcp 65001 >nul')  # Windows终端UTF-8编码
+    if "--benchmark-preprocess" in sys.argv:
+        importHeavyModules()
+        runPreprocessBenchmark()
+        sys.exit(0)
+    if "--benchmark-similarity" in sys.argv:
+        importHeavyModules()
+        runSimilarityBenchmark()
+        sys.exit(0)
+    if "--benchmark-capture" in sys.argv:
+        runCaptureBenchmark()
+        sys.exit(0)
+    if "--calibrate-key-timing" in sys.argv:
+        runKeyTimingCalibration()
+        sys.exit(0)
     main()
\ No newline at end of file